@@ -0,0 +1,267 @@
+# FutStats/core/analises.py
+"""
+Cálculo e gravação das análises pré-calculadas (MatchAnalysis + MarketEdge).
+
+Usado pelo `precomputar_analises` (janela de dias; com `--as-of`, partidas
+passadas com a forma no pontapé inicial) e pelo `reanalisar_pendentes` (fila de
+partidas alteradas pelos importadores).
+"""
+
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+import numpy as np
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .markets import ODD_FIELDS
+from .models import BestOdds, MatchAnalysis, MarketEdge
+from .stats_engine import FormEngine, FormHistory
+from .prob_engines import get_engine, probabilidades_da_partida, probabilidades_por_engine
+from .utils import edges_da_analise, fingerprint_analise, gerar_insights_rapidos, team_rates_da_forma
+
+# Mercados com coluna em MatchOdds (registro em core.markets)
+MARKETS = ODD_FIELDS
+
+# Colunas das linhas de BestOdds enviadas aos workers (tuplas simples, sem models).
+BEST_ODDS_COLUMNS = ["match_id", "market", "price", "bookmaker__name", "bookmaker__is_brazilian", "fetched_at"]
+
+
+def _melhores_odds(best_rows, match_ids):
+    """
+    Melhor odd por mercado de cada partida (já calculada em BestOdds).
+    `best_rows` no formato de BEST_ODDS_COLUMNS.
+    """
+    best_by_match = {mid: {k: None for (k, _) in MARKETS} for mid in match_ids}
+
+    for match_id, market, price, bm_name, bm_is_brazilian, fetched_at in best_rows:
+        best_by_match[match_id][market] = {
+            "odd": float(price),
+            "bookmaker": bm_name,
+            "is_brazilian": bool(bm_is_brazilian),
+            "last_updated": fetched_at.isoformat() if fetched_at else None,
+        }
+
+    return best_by_match
+
+
+def calcular_analises(job):
+    """
+    Calcula as análises de um grupo de partidas (uma liga ou rodada) sem acessar o banco.
+    Roda no processo principal ou em um worker do ProcessPoolExecutor.
+
+    job: matches (com home_team/away_team carregados), engine (forma dos times do
+    grupo, com cartões/escanteios), odds (linhas de BEST_ODDS_COLUMNS), fingerprints
+    salvos, sample_limit e force.
+
+    Todos os engines de probabilidade registrados rodam sobre as mesmas taxas
+    (uma passada vetorizada cada); `probabilities` recebe as do engine padrão.
+
+    Retorna (analyses, skipped): analyses = [(match_id, campos do MatchAnalysis,
+    linhas de MarketEdge de todos os engines)].
+    """
+    matches = job["matches"]
+    engine = job["engine"]
+    sample_limit = job["sample_limit"]
+
+    best_by_match = _melhores_odds(job["odds"], [m.id for m in matches])
+
+    home_rates = engine.taxas(engine.indices([m.home_team_id for m in matches]), sample_limit)
+    away_rates = engine.taxas(engine.indices([m.away_team_id for m in matches]), sample_limit)
+
+    probs_by_engine = probabilidades_por_engine(home_rates, away_rates)
+    default_key = get_engine().key
+
+    analyses = []
+    skipped = 0
+
+    for i, match in enumerate(matches):
+        best_by_market = best_by_match.get(match.id) or {}
+        fingerprint = fingerprint_analise(
+            engine.match_ids_de(match.home_team_id),
+            engine.match_ids_de(match.away_team_id),
+            sample_limit,
+            best_by_market,
+            kickoff=match.date,
+            home_cards_corners=engine.cartoes_escanteios_de(match.home_team_id),
+            away_cards_corners=engine.cartoes_escanteios_de(match.away_team_id),
+        )
+        if not job["force"] and job["fingerprints"].get(match.id) == fingerprint:
+            skipped += 1
+            continue
+
+        engine_probabilities = probabilidades_da_partida(probs_by_engine, i)
+
+        edges = [
+            {"engine": key, **edge}
+            for key, probabilities in engine_probabilities.items()
+            for edge in edges_da_analise(probabilities, best_by_market)
+        ]
+
+        analyses.append((match.id, {
+            "sample_limit": sample_limit,
+            "input_fingerprint": fingerprint,
+            "probabilities": engine_probabilities[default_key],
+            "engine_probabilities": engine_probabilities,
+            "team_rates": team_rates_da_forma(
+                {k: v[i] for k, v in home_rates.items()},
+                {k: v[i] for k, v in away_rates.items()},
+                sample_limit,
+            ),
+            "insights": gerar_insights_rapidos(match, engine),
+            "best_by_market": best_by_market,
+        }, edges))
+
+    return analyses, skipped
+
+
+def _grupos_historicos(matches, sample_limit):
+    """
+    Forma dos times de cada partida no pontapé inicial (FormHistory: só jogos
+    anteriores), para análises de partidas passadas sem vazar resultados futuros.
+
+    As partidas são divididas em rodadas em que cada time aparece uma única vez,
+    então o engine de cada rodada tem uma linha por time e os acessos por time
+    (`*_de`) usados no cálculo continuam valendo.
+
+    Retorna [(partidas, engine)].
+    """
+    team_ids = {m.home_team_id for m in matches} | {m.away_team_id for m in matches}
+    engine, home_idx, away_idx = FormHistory.carregar(team_ids).forma_das_partidas(matches, limit=sample_limit)
+    engine.carregar_cartoes_escanteios()
+
+    rodadas = []  # [(times da rodada, posições das partidas)]
+    for pos, match in enumerate(matches):
+        times = (match.home_team_id, match.away_team_id)
+        for rodada_times, posicoes in rodadas:
+            if rodada_times.isdisjoint(times):
+                break
+        else:
+            rodada_times, posicoes = set(), []
+            rodadas.append((rodada_times, posicoes))
+        rodada_times.update(times)
+        posicoes.append(pos)
+
+    return [
+        ([matches[p] for p in posicoes], engine.linhas(np.r_[home_idx[posicoes], away_idx[posicoes]]))
+        for _, posicoes in rodadas
+    ]
+
+
+def salvar_analises(matches, sample_limit=5, force=False, batch_size=500, workers=1, historico=False):
+    """
+    Calcula e grava (upsert em lote) as análises das partidas informadas
+    (com home_team/away_team/league carregados).
+
+    - force: recalcula mesmo com fingerprint igual
+    - workers: > 1 divide o cálculo por grupo (liga ou rodada) em um ProcessPoolExecutor
+    - historico: forma de cada time no pontapé inicial (`_grupos_historicos`) em
+      vez da forma atual; para reconstruir análises passadas/backtests
+
+    Retorna (upserts, skipped).
+    """
+    if not matches:
+        return 0, 0
+
+    match_ids = [m.id for m in matches]
+
+    if historico:
+        grupos = _grupos_historicos(matches, sample_limit)
+    else:
+        # Forma recente (TeamForm: 1 linha por time) apenas dos times da janela,
+        # convertida uma única vez em arrays com as taxas de todos os times.
+        team_ids = {m.home_team_id for m in matches} | {m.away_team_id for m in matches}
+        engine = FormEngine.carregar(limit=sample_limit, team_ids=team_ids)
+        engine.carregar_cartoes_escanteios()
+
+        # Um grupo por liga, com apenas a forma dos times dela.
+        by_league = defaultdict(list)
+        for match in matches:
+            by_league[match.league_id].append(match)
+
+        grupos = []
+        for league_matches in by_league.values():
+            league_team_ids = {m.home_team_id for m in league_matches} | {m.away_team_id for m in league_matches}
+            grupos.append((league_matches, engine.subconjunto(league_team_ids) if workers > 1 else engine))
+
+    # Melhor odd por mercado já mantida pelo importador (BestOdds), em tuplas
+    odds_by_match = defaultdict(list)
+    for row in (
+        BestOdds.objects.filter(match_id__in=match_ids, market__in=[k for k, _ in MARKETS])
+        .values_list(*BEST_ODDS_COLUMNS)
+    ):
+        odds_by_match[row[0]].append(row)
+
+    # Fingerprints atuais (1 consulta): só recalcula partidas cujas entradas mudaram.
+    saved_fingerprints = dict(
+        MatchAnalysis.objects.filter(match_id__in=match_ids).values_list("match_id", "input_fingerprint")
+    )
+
+    # Um job por grupo, com apenas as odds e os fingerprints das partidas dele.
+    jobs = [
+        {
+            "matches": group_matches,
+            "engine": group_engine,
+            "odds": [row for m in group_matches for row in odds_by_match.get(m.id, [])],
+            "fingerprints": {m.id: saved_fingerprints.get(m.id) for m in group_matches},
+            "sample_limit": sample_limit,
+            "force": force,
+        }
+        for group_matches, group_engine in grupos
+    ]
+
+    if workers > 1 and len(jobs) > 1:
+        # Workers só calculam (sem banco); fecha as conexões antes do fork.
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs)), initializer=django.setup) as pool:
+            results = list(pool.map(calcular_analises, jobs))
+    else:
+        results = [calcular_analises(job) for job in jobs]
+
+    now = timezone.now()
+    match_by_id = {m.id: m for m in matches}
+    analyses = []
+    edges = []
+    for group_analyses, _ in results:
+        for match_id, fields, match_edges in group_analyses:
+            match = match_by_id[match_id]
+            analyses.append(MatchAnalysis(match_id=match_id, computed_at=now, **fields))
+            edges.extend(
+                MarketEdge(
+                    match_id=match_id,
+                    league_id=match.league_id,
+                    kickoff=match.date,
+                    computed_at=now,
+                    **edge,
+                )
+                for edge in match_edges
+            )
+    skipped = sum(group_skipped for _, group_skipped in results)
+
+    with transaction.atomic():
+        # Upsert em lote: 1 INSERT ... ON CONFLICT por chunk de `batch_size`.
+        MatchAnalysis.objects.bulk_create(
+            analyses,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=["match"],
+            update_fields=[
+                "sample_limit",
+                "input_fingerprint",
+                "probabilities",
+                "engine_probabilities",
+                "team_rates",
+                "insights",
+                "best_by_market",
+                "computed_at",
+                "updated_at",
+            ],
+        )
+
+        # Edges das partidas recalculadas são substituídos (mercados sem odd saem).
+        MarketEdge.objects.filter(match_id__in=[a.match_id for a in analyses]).delete()
+        MarketEdge.objects.bulk_create(edges, batch_size=batch_size)
+    upserts = len(analyses)
+
+    return upserts, skipped
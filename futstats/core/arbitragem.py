@@ -0,0 +1,106 @@
+# FutStats/core/arbitragem.py
+"""
+Busca de arbitragem (surebet) entre bookmakers.
+
+Para cada conjunto completo de resultados (`markets.OUTCOME_SETS`: 1X2, cada linha
+de totais e BTTS) pega o melhor preço de cada resultado (BestOdds) e verifica se
+a soma das probabilidades implícitas (1 / odd) fica abaixo de 1. Todas as partidas
+da janela são avaliadas de uma vez sobre uma matriz resultado x partida.
+
+Usado pelo `scan_arbitragem` e pela API /api/arbitrage/.
+"""
+
+import numpy as np
+
+from .markets import MARKETS_BY_KEY, OUTCOME_SETS
+from .models import BestOdds, Match
+
+# Folga para não reportar "arbitragem" por arredondamento (soma = 0.99999...)
+EPSILON = 1e-9
+
+
+def _matriz_de_odds(match_ids):
+    """
+    Matriz [resultados, partidas] com o melhor preço de cada resultado (NaN sem odd)
+    e o bookmaker de cada célula.
+    """
+    keys = [key for _, outcome_keys in OUTCOME_SETS.values() for key in outcome_keys]
+    row = {key: i for i, key in enumerate(keys)}
+    col = {match_id: j for j, match_id in enumerate(match_ids)}
+
+    odds = np.full((len(keys), len(match_ids)), np.nan)
+    bookmakers = {}
+    for match_id, market, price, bm_name, bm_is_brazilian in (
+        BestOdds.objects.filter(match_id__in=match_ids, market__in=keys)
+        .values_list("match_id", "market", "price", "bookmaker__name", "bookmaker__is_brazilian")
+    ):
+        i, j = row[market], col[match_id]
+        odds[i, j] = float(price)
+        bookmakers[(i, j)] = (bm_name, bool(bm_is_brazilian))
+
+    return odds, row, bookmakers
+
+
+def escanear_arbitragem(inicio, fim, league=None, min_profit=0.0, stake=100.0):
+    """
+    Oportunidades de arbitragem das partidas entre `inicio` e `fim` (maior lucro primeiro).
+
+    min_profit: lucro garantido mínimo, em % do total apostado
+    stake: total a distribuir entre as pernas (valores em `legs[].stake`)
+    """
+    matches_qs = Match.objects.filter(date__gte=inicio, date__lt=fim)
+    if league:
+        matches_qs = matches_qs.filter(league__name=league)
+    matches = list(matches_qs.select_related("home_team", "away_team", "league").order_by("date", "id"))
+    if not matches:
+        return []
+
+    odds, row, bookmakers = _matriz_de_odds([m.id for m in matches])
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        inverse = 1.0 / odds
+
+    results = []
+    for set_key, (set_label, outcome_keys) in OUTCOME_SETS.items():
+        idx = [row[key] for key in outcome_keys]
+        inv = inverse[idx]                     # [resultados do conjunto, partidas]
+        total = inv.sum(axis=0)                # NaN se faltar algum resultado
+        profit = (1.0 / total - 1.0) * 100
+
+        hits = np.flatnonzero((total < 1.0 - EPSILON) & (profit >= min_profit))
+        if not len(hits):
+            continue
+
+        # Divisão do stake: proporcional a 1/odd, mesmo retorno em qualquer resultado
+        split = inv[:, hits] / total[hits]
+
+        for h, j in enumerate(hits.tolist()):
+            match = matches[j]
+            legs = []
+            for k, (key, i) in enumerate(zip(outcome_keys, idx)):
+                bm_name, bm_is_brazilian = bookmakers[(i, j)]
+                legs.append({
+                    "market": key,
+                    "label": MARKETS_BY_KEY[key].label,
+                    "odd": round(float(odds[i, j]), 2),
+                    "bookmaker": bm_name,
+                    "is_brazilian": bm_is_brazilian,
+                    "stake_pct": round(float(split[k, h]) * 100, 2),
+                    "stake": round(float(split[k, h]) * stake, 2),
+                })
+
+            results.append({
+                "match_id": match.id,
+                "match": f"{match.home_team.name} x {match.away_team.name}",
+                "league": match.league.name if match.league else None,
+                "date": match.date.isoformat() if match.date else None,
+                "market": set_key,
+                "market_label": set_label,
+                "inverse_sum": round(float(total[j]), 4),
+                "profit_pct": round(float(profit[j]), 2),
+                "payout": round(stake / float(total[j]), 2),
+                "legs": legs,
+            })
+
+    results.sort(key=lambda r: (-r["profit_pct"], r["date"] or "", r["match_id"]))
+    return results
@@ -1,11 +1,16 @@
 # FutStats/core/betting_utils.py
 
 from decimal import Decimal
+
+import numpy as np
+from django.db import transaction
 from django.db.models import Q
 from django.utils import timezone
 from datetime import timedelta
+from .markets import ODD_FIELD
 from .models import MatchOdds, BetRecommendation, Bookmaker, Match
-from .utils import calcular_over25, calcular_btts, calcular_media_gols, preload_ultimos_jogos
+from .utils import calcular_over25, calcular_btts, carregar_forma_times
+from .stats_engine import FormEngine
 
 
 def odd_to_implied_probability(odd):
@@ -46,78 +51,182 @@ def calculate_value_percentage(calculated_prob, implied_prob):
     return value_pct
 
 
-def analyze_match_betting_value(match, cache=None):
+# ============================================================
+# Motor de EV em lote (NumPy)
+# ============================================================
+# Mercados avaliados na busca de value bets: (bet_type, campo em MatchOdds)
+VALUE_BET_MARKETS = [(key, ODD_FIELD[key]) for key in ("over_25", "btts_yes")]
+
+# EV mínimo (em %) para considerar value bet; evita ruído de ponto flutuante em EV == 0.
+EV_EPSILON = 1e-9
+
+CENTAVOS = Decimal("0.01")
+
+
+def calcular_ev_lote(calculated_probs, odds):
+    """
+    Versão vetorizada (float64) de odd_to_implied_probability, calculate_expected_value
+    e calculate_value_percentage para todas as apostas candidatas de uma vez.
+
+    Retorna dict de arrays: implied_probability, expected_value e value_percentage
+    (em %, NaN para odds <= 0) e confidence ('high' / 'medium' / 'low').
+    """
+    p = np.asarray(calculated_probs, dtype=np.float64)
+    odds = np.asarray(odds, dtype=np.float64)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        valid = odds > 0
+        implied = np.where(valid, 100 / odds, np.nan)
+        ev = np.where(valid, (p / 100 * odds - 1) * 100, np.nan)
+        value_pct = (p - implied) / implied * 100
+
+    confidence = np.where(value_pct > 10, "high", np.where(value_pct > 5, "medium", "low"))
+
+    return {
+        "implied_probability": implied,
+        "expected_value": ev,
+        "value_percentage": value_pct,
+        "confidence": confidence,
+    }
+
+
+def _to_decimal(value):
+    """Quantiza para 2 casas só na hora de persistir (campos DecimalField)."""
+    return Decimal(str(float(value))).quantize(CENTAVOS)
+
+
+def _recomendacoes_de_valor(matches, cache, odds_by_match):
+    """
+    Monta as apostas candidatas (partida x bookmaker x mercado) de todas as partidas,
+    calcula EV em lote e retorna as BetRecommendation com EV > 0, da maior para a menor.
+    """
+    candidates = []  # (match, bet_type, prob, match_odd, odd)
+
+    for match in matches:
+        odds_list = odds_by_match.get(match.id) or []
+        if not odds_list:
+            continue  # Sem odds disponíveis
+
+        home = match.home_team
+        away = match.away_team
+
+        # Calcular probabilidades baseadas em estatísticas
+        probs = {
+            "over_25": (calcular_over25(home, cache) + calcular_over25(away, cache)) / 2,
+            "btts_yes": (calcular_btts(home, cache) + calcular_btts(away, cache)) / 2,
+        }
+
+        for match_odd in odds_list:
+            for bet_type, field in VALUE_BET_MARKETS:
+                odd = getattr(match_odd, field)
+                if odd:
+                    candidates.append((match, bet_type, probs[bet_type], match_odd, odd))
+
+    if not candidates:
+        return []
+
+    result = calcular_ev_lote(
+        [prob for _, _, prob, _, _ in candidates],
+        [float(odd) for _, _, _, _, odd in candidates],
+    )
+    ev = result["expected_value"]
+
+    # Apenas value bets, ordenadas por EV (maior primeiro; empate mantém a ordem de entrada)
+    value_idx = np.flatnonzero(ev > EV_EPSILON)
+    value_idx = value_idx[np.argsort(-ev[value_idx], kind="stable")]
+
+    recommendations = []
+    for i in value_idx.tolist():
+        match, bet_type, prob, match_odd, odd = candidates[i]
+        recommendations.append(BetRecommendation(
+            match=match,
+            bet_type=bet_type,
+            calculated_probability=_to_decimal(prob),
+            implied_probability=_to_decimal(result["implied_probability"][i]),
+            odd_value=odd,
+            expected_value=_to_decimal(ev[i]),
+            value_percentage=_to_decimal(result["value_percentage"][i]),
+            is_value_bet=True,
+            confidence=str(result["confidence"][i]),
+            bookmaker=match_odd.bookmaker,
+        ))
+
+    return recommendations
+
+
+def analyze_match_betting_value(match, cache=None, odds_list=None):
     """
     Analisa uma partida e identifica apostas com valor
-    Retorna lista de recomendações
+    Retorna lista de recomendações (maior EV primeiro)
+
+    odds_list: odds da partida já carregadas (com bookmaker); se None, busca no banco
     """
     if cache is None:
-        cache = preload_ultimos_jogos()
-    
-    home = match.home_team
-    away = match.away_team
+        cache = carregar_forma_times(team_ids=[match.home_team_id, match.away_team_id])
     
     # Buscar odds disponíveis para esta partida
-    odds_list = MatchOdds.objects.filter(match=match).select_related('bookmaker')
-    
-    if not odds_list.exists():
-        return []  # Sem odds disponíveis
-    
-    recommendations = []
-    
-    # Calcular probabilidades baseadas em estatísticas
-    over25_prob = (calcular_over25(home, cache) + calcular_over25(away, cache)) / 2
-    btts_prob = (calcular_btts(home, cache) + calcular_btts(away, cache)) / 2
-    
-    # Analisar cada odd disponível
-    for match_odd in odds_list:
-        bookmaker = match_odd.bookmaker
-        
-        # Analisar Over 2.5
-        if match_odd.over_25_odd:
-            implied_prob = odd_to_implied_probability(match_odd.over_25_odd)
-            if implied_prob:
-                ev = calculate_expected_value(over25_prob, match_odd.over_25_odd)
-                value_pct = calculate_value_percentage(over25_prob, implied_prob)
-                
-                if ev and ev > 0:  # Value bet encontrado
-                    recommendation = BetRecommendation(
-                        match=match,
-                        bet_type='over_25',
-                        calculated_probability=Decimal(str(over25_prob)),
-                        implied_probability=Decimal(str(implied_prob)),
-                        odd_value=match_odd.over_25_odd,
-                        expected_value=Decimal(str(ev)),
-                        value_percentage=Decimal(str(value_pct)),
-                        is_value_bet=True,
-                        confidence='high' if value_pct > 10 else 'medium' if value_pct > 5 else 'low',
-                        bookmaker=bookmaker
-                    )
-                    recommendations.append(recommendation)
-        
-        # Analisar BTTS
-        if match_odd.btts_yes_odd:
-            implied_prob = odd_to_implied_probability(match_odd.btts_yes_odd)
-            if implied_prob:
-                ev = calculate_expected_value(btts_prob, match_odd.btts_yes_odd)
-                value_pct = calculate_value_percentage(btts_prob, implied_prob)
-                
-                if ev and ev > 0:
-                    recommendation = BetRecommendation(
-                        match=match,
-                        bet_type='btts_yes',
-                        calculated_probability=Decimal(str(btts_prob)),
-                        implied_probability=Decimal(str(implied_prob)),
-                        odd_value=match_odd.btts_yes_odd,
-                        expected_value=Decimal(str(ev)),
-                        value_percentage=Decimal(str(value_pct)),
-                        is_value_bet=True,
-                        confidence='high' if value_pct > 10 else 'medium' if value_pct > 5 else 'low',
-                        bookmaker=bookmaker
-                    )
-                    recommendations.append(recommendation)
+    if odds_list is None:
+        odds_list = list(MatchOdds.objects.filter(match=match).select_related('bookmaker'))
     
-    return recommendations
+    return _recomendacoes_de_valor([match], cache, {match.id: odds_list})
+
+
+# Campos comparados na sincronização (os demais formam a chave única)
+RECOMMENDATION_FIELDS = [
+    "calculated_probability",
+    "implied_probability",
+    "odd_value",
+    "expected_value",
+    "value_percentage",
+    "is_value_bet",
+    "confidence",
+]
+
+
+def sincronizar_recomendacoes(recommendations, start_date, batch_size=500):
+    """
+    Sincroniza as BetRecommendation a partir de `start_date` com a lista calculada,
+    pela chave (match, bet_type, bookmaker), em uma única transação:
+    - alteradas: bulk_update (mantém id, created_at e o preço recomendado)
+    - novas: bulk_create, gravando recommended_odd/recommended_at (base do CLV)
+    - que sumiram: delete por id
+
+    Retorna (criadas, atualizadas, removidas).
+    """
+    existing = {
+        (row.match_id, row.bet_type, row.bookmaker_id): row
+        for row in BetRecommendation.objects.filter(match__date__gte=start_date).only(
+            "id", "match_id", "bet_type", "bookmaker_id", "created_at", *RECOMMENDATION_FIELDS
+        )
+    }
+
+    now = timezone.now()
+    to_create = []
+    to_update = []
+    for rec in recommendations:
+        row = existing.pop((rec.match_id, rec.bet_type, rec.bookmaker_id), None)
+        if row is None:
+            rec.recommended_odd = rec.odd_value
+            rec.recommended_at = now
+            to_create.append(rec)
+            continue
+        rec.pk = row.pk
+        rec.created_at = row.created_at
+        if any(getattr(rec, f) != getattr(row, f) for f in RECOMMENDATION_FIELDS):
+            to_update.append(rec)
+
+    stale_ids = [row.pk for row in existing.values()]
+
+    with transaction.atomic():
+        if stale_ids:
+            for i in range(0, len(stale_ids), batch_size):
+                BetRecommendation.objects.filter(id__in=stale_ids[i:i + batch_size]).delete()
+        if to_update:
+            BetRecommendation.objects.bulk_update(to_update, RECOMMENDATION_FIELDS, batch_size=batch_size)
+        if to_create:
+            BetRecommendation.objects.bulk_create(to_create, batch_size=batch_size)
+
+    return len(to_create), len(to_update), len(stale_ids)
 
 
 def get_best_value_bets(limit=10):
@@ -129,204 +238,95 @@ def get_best_value_bets(limit=10):
     start_date = current_time.replace(hour=0, minute=0, second=0, microsecond=0)  # Início de hoje
     future_date = start_date + timedelta(days=3)  # 3 dias à frente
     
-    matches = Match.objects.filter(
+    matches = list(Match.objects.filter(
         date__gte=start_date,  # A partir do início de hoje
         date__lte=future_date
-    ).select_related('home_team', 'away_team', 'league')
-    
-    cache = preload_ultimos_jogos()
-    all_recommendations = []
-    
-    for match in matches:
-        recommendations = analyze_match_betting_value(match, cache)
-        all_recommendations.extend(recommendations)
-    
-    # Ordenar por valor esperado (maior primeiro)
-    all_recommendations.sort(key=lambda x: x.expected_value, reverse=True)
+    ).select_related('home_team', 'away_team', 'league'))
     
-    # Salvar no banco (limpar recomendações antigas primeiro)
-    BetRecommendation.objects.filter(match__date__gte=start_date).delete()
+    team_ids = {m.home_team_id for m in matches} | {m.away_team_id for m in matches}
+    cache = FormEngine.carregar(team_ids=team_ids)
+
+    # Todas as odds da janela em 1 consulta, agrupadas por partida
+    odds_by_match = {}
+    for match_odd in MatchOdds.objects.filter(match__in=matches).select_related('bookmaker'):
+        odds_by_match.setdefault(match_odd.match_id, []).append(match_odd)
+
+    # EV de todas as apostas candidatas da janela em lote (já ordenadas por EV)
+    all_recommendations = _recomendacoes_de_valor(matches, cache, odds_by_match)
     
-    for rec in all_recommendations:
-        rec.save()
+    # Sincronizar com o banco: só o que mudou é escrito. Partidas já iniciadas
+    # ficam de fora (a recomendação vira histórico para o CLV; odds ao vivo não entram).
+    sincronizar_recomendacoes(
+        [rec for rec in all_recommendations if rec.match.date > current_time],
+        current_time,
+    )
     
     return all_recommendations[:limit]
 
 
-def get_best_probabilities(limit=10):
+# ============================================================
+# Carteira do dia: Kelly fracionado em lote
+# ============================================================
+KELLY_FRACTION = 0.25        # fração do Kelly cheio
+MAX_STAKE_PER_MATCH = 0.05   # teto por partida (fração da banca): over 2.5 + BTTS são correlacionados
+MAX_DAILY_EXPOSURE = 0.25    # teto do dia (fração da banca)
+
+
+def kelly_em_lote(calculated_probs, odds, match_ids,
+                  fraction=KELLY_FRACTION,
+                  max_per_match=MAX_STAKE_PER_MATCH,
+                  max_total=MAX_DAILY_EXPOSURE):
     """
-    Retorna as melhores probabilidades de cada tipo de aposta bater
-    Ordena por probabilidade calculada (maior primeiro)
+    Stakes (fração da banca) de todas as apostas de uma vez:
+    Kelly f* = (p * odd - 1) / (odd - 1), negativo vira 0, vezes `fraction`;
+    depois as apostas de cada partida são reduzidas proporcionalmente até
+    `max_per_match`, e o total do dia até `max_total`.
     """
-    # Buscar partidas a partir do início de hoje até 3 dias à frente
-    current_time = timezone.now()
-    start_date = current_time.replace(hour=0, minute=0, second=0, microsecond=0)  # Início de hoje
-    future_date = start_date + timedelta(days=3)  # 3 dias à frente
-    
-    matches = Match.objects.filter(
-        date__gte=start_date,  # A partir do início de hoje
-        date__lte=future_date
-    ).select_related('home_team', 'away_team', 'league')
-    
-    cache = preload_ultimos_jogos()
-    all_probabilities = []
-    
-    matches_with_odds = 0
-    matches_without_odds = 0
-    
-    for match in matches:
-        home = match.home_team
-        away = match.away_team
-        
-        # Buscar odds disponíveis para esta partida
-        odds_list = MatchOdds.objects.filter(match=match).select_related('bookmaker')
-        
-        if not odds_list.exists():
-            matches_without_odds += 1
-            continue
-        
-        matches_with_odds += 1
-        
-        # Calcular probabilidades baseadas em estatísticas
-        over25_prob = (calcular_over25(home, cache) + calcular_over25(away, cache)) / 2
-        btts_prob = (calcular_btts(home, cache) + calcular_btts(away, cache)) / 2
-        
-        # Calcular médias de gols para 1X2
-        home_goals_avg = calcular_media_gols(home, cache)
-        away_goals_avg = calcular_media_gols(away, cache)
-        
-        # Calcular diferença de gols
-        diff_gols = home_goals_avg - away_goals_avg
-        
-        # Analisar cada odd disponível
-        for match_odd in odds_list:
-            bookmaker = match_odd.bookmaker
-            
-            # Over 2.5 - ADICIONAR LOG
-            if match_odd.over_25_odd:
-                implied_prob = odd_to_implied_probability(match_odd.over_25_odd)
-                if implied_prob:
-                    all_probabilities.append({
-                        "match": match,
-                        "bet_type": "over_25",
-                        "bet_name": "Mais de 2.5 Gols",
-                        "calculated_probability": round(over25_prob, 2),
-                        "implied_probability": implied_prob,
-                        "odd": match_odd.over_25_odd,
-                        "bookmaker": bookmaker,
-                        "difference": round(over25_prob - implied_prob, 2),
-                    })
-            
-            # BTTS (se disponível)
-            if match_odd.btts_yes_odd:
-                implied_prob = odd_to_implied_probability(match_odd.btts_yes_odd)
-                if implied_prob:
-                    all_probabilities.append({
-                        "match": match,
-                        "bet_type": "btts_yes",
-                        "bet_name": "Ambos Marcam (BTTS)",
-                        "calculated_probability": round(btts_prob, 2),
-                        "implied_probability": implied_prob,
-                        "odd": match_odd.btts_yes_odd,
-                        "bookmaker": bookmaker,
-                        "difference": round(btts_prob - implied_prob, 2),
-                    })
-            
-            # 1X2 (Home Win) - MELHORAR CÁLCULO
-            if match_odd.home_win_odd:
-                implied_prob = odd_to_implied_probability(match_odd.home_win_odd)
-                if implied_prob:
-                    # Melhorar cálculo: usar diferença de gols e considerar vantagem de casa
-                    diff_gols = home_goals_avg - away_goals_avg
-                    
-                    # Base: 33.33% (chance igual para cada resultado)
-                    # Vantagem de casa: +10%
-                    # Diferença de gols: ajuste proporcional
-                    base_prob = 33.33
-                    home_advantage = 10
-                    goal_diff_factor = diff_gols * 8  # Cada gol de diferença = 8% de ajuste
-                    
-                    home_win_prob = base_prob + home_advantage + goal_diff_factor
-                    home_win_prob = max(15, min(75, home_win_prob))  # Limitar entre 15% e 75%
-                    
-                    all_probabilities.append({
-                        "match": match,
-                        "bet_type": "home_win",
-                        "bet_name": f"Vitória {home.name}",
-                        "calculated_probability": round(home_win_prob, 2),
-                        "implied_probability": implied_prob,
-                        "odd": match_odd.home_win_odd,
-                        "bookmaker": bookmaker,
-                        "difference": round(home_win_prob - implied_prob, 2),
-                    })
-            
-            # 1X2 (Away Win) - MELHORAR CÁLCULO
-            if match_odd.away_win_odd:
-                implied_prob = odd_to_implied_probability(match_odd.away_win_odd)
-                if implied_prob:
-                    diff_gols = away_goals_avg - home_goals_avg
-                    
-                    base_prob = 33.33
-                    away_advantage = -5  # Desvantagem de jogar fora
-                    goal_diff_factor = diff_gols * 8
-                    
-                    away_win_prob = base_prob + away_advantage + goal_diff_factor
-                    away_win_prob = max(15, min(75, away_win_prob))
-                    
-                    all_probabilities.append({
-                        "match": match,
-                        "bet_type": "away_win",
-                        "bet_name": f"Vitória {away.name}",
-                        "calculated_probability": round(away_win_prob, 2),
-                        "implied_probability": implied_prob,
-                        "odd": match_odd.away_win_odd,
-                        "bookmaker": bookmaker,
-                        "difference": round(away_win_prob - implied_prob, 2),
-                    })
-            
-            # 1X2 (Draw) - MELHORAR CÁLCULO
-            if match_odd.draw_odd:
-                implied_prob = odd_to_implied_probability(match_odd.draw_odd)
-                if implied_prob:
-                    # Empate geralmente entre 20-30%, ajustar baseado em quão equilibrados são os times
-                    diff_gols = abs(home_goals_avg - away_goals_avg)
-                    # Quanto mais equilibrados, maior chance de empate
-                    draw_prob = 30 - (diff_gols * 3)  # Cada gol de diferença reduz 3%
-                    draw_prob = max(20, min(35, draw_prob))
-                    
-                    all_probabilities.append({
-                        "match": match,
-                        "bet_type": "draw",
-                        "bet_name": "Empate",
-                        "calculated_probability": round(draw_prob, 2),
-                        "implied_probability": implied_prob,
-                        "odd": match_odd.draw_odd,
-                        "bookmaker": bookmaker,
-                        "difference": round(draw_prob - implied_prob, 2),
-                    })
-    
-    # Agrupar por (match, bet_type) e escolher a melhor odd para cada mercado
-    # Usar um dicionário para agrupar: {(match_id, bet_type): melhor_probabilidade}
-    grouped_probabilities = {}
-    
-    for prob in all_probabilities:
-        match_id = prob["match"].id
-        bet_type = prob["bet_type"]
-        key = (match_id, bet_type)
-        
-        # Se já existe uma entrada para este mercado, comparar e manter a melhor odd
-        if key in grouped_probabilities:
-            existing = grouped_probabilities[key]
-            # Manter a maior odd (melhor para o apostador)
-            if prob["odd"] > existing["odd"]:
-                grouped_probabilities[key] = prob
-        else:
-            grouped_probabilities[key] = prob
-    
-    # Converter de volta para lista
-    unique_probabilities = list(grouped_probabilities.values())
-    
-    # Ordenar por probabilidade calculada (maior primeiro)
-    unique_probabilities.sort(key=lambda x: x["calculated_probability"], reverse=True)
-    
-    return unique_probabilities[:limit]
+    p = np.asarray(calculated_probs, dtype=np.float64) / 100
+    odds = np.asarray(odds, dtype=np.float64)
+    if not len(p):
+        return np.zeros(0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        kelly = np.where(odds > 1, (p * odds - 1) / (odds - 1), 0.0)
+    stakes = np.clip(np.nan_to_num(kelly), 0, None) * fraction
+
+    # Teto por partida
+    _, match_idx = np.unique(np.asarray(match_ids), return_inverse=True)
+    per_match = np.bincount(match_idx, weights=stakes)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scale = np.where(per_match > max_per_match, max_per_match / per_match, 1.0)
+    stakes = stakes * scale[match_idx]
+
+    # Teto da banca no dia
+    total = stakes.sum()
+    if total > max_total:
+        stakes = stakes * (max_total / total)
+
+    return stakes
+
+
+def dimensionar_carteira(recommendations, **limits):
+    """
+    Stake sugerido (fração da banca) para cada BetRecommendation da lista, na mesma ordem.
+    Só a melhor odd de cada (partida, mercado) entra na carteira; as demais ficam com 0.
+    `limits`: fraction, max_per_match e max_total de `kelly_em_lote`.
+    """
+    stakes = np.zeros(len(recommendations))
+
+    chosen = {}
+    for i, rec in enumerate(recommendations):
+        key = (rec.match_id, rec.bet_type)
+        if key not in chosen or rec.odd_value > recommendations[chosen[key]].odd_value:
+            chosen[key] = i
+    idx = sorted(chosen.values())
+    if not idx:
+        return stakes
+
+    stakes[idx] = kelly_em_lote(
+        [float(recommendations[i].calculated_probability) for i in idx],
+        [float(recommendations[i].odd_value) for i in idx],
+        [recommendations[i].match_id for i in idx],
+        **limits,
+    )
+    return stakes
@@ -0,0 +1,128 @@
+# FutStats/core/clv.py
+"""
+Closing line value (CLV) das recomendações.
+
+Para cada BetRecommendation de partida já iniciada, o preço de fechamento é o
+último preço do mesmo bookmaker/mercado gravado no OddsHistory antes do kickoff
+(subconsulta correlacionada: uma única consulta para o lote inteiro).
+CLV = (odd recomendada / odd de fechamento - 1) * 100, com a odd recomendada
+fixada na criação da recomendação (`recommended_odd`; o `odd_value` acompanha
+as odds atuais).
+
+O job é incremental: processa só recomendações de partidas que começaram ou
+recomendações criadas desde a última execução (marca d'água em JobCheckpoint
+"clv") e soma os resultados em CLVSummary (mercado x liga x bookmaker).
+Usado pelo `avaliar_clv`.
+"""
+
+from collections import defaultdict
+
+import numpy as np
+from django.db import transaction
+from django.db.models import OuterRef, Q, Subquery
+from django.utils import timezone
+
+from .models import BetRecommendation, CLVSummary, JobCheckpoint, OddsHistory
+
+CHECKPOINT = "clv"
+
+
+def _recomendacoes_com_fechamento(desde, ate):
+    """
+    (id, mercado, liga, bookmaker, odd recomendada, fechamento x 100 ou None)
+    das recomendações de partidas iniciadas até `ate` com kickoff ou criação
+    depois de `desde` (cada recomendação entra em uma única execução).
+    """
+    closing = (
+        OddsHistory.objects.filter(
+            match_id=OuterRef("match_id"),
+            bookmaker_id=OuterRef("bookmaker_id"),
+            market=OuterRef("bet_type"),
+            fetched_at__lt=OuterRef("match__date"),
+        )
+        .order_by("-fetched_at", "-id")
+        .values("price")[:1]
+    )
+
+    qs = BetRecommendation.objects.filter(
+        bookmaker__isnull=False, recommended_odd__isnull=False, match__date__lte=ate
+    )
+    if desde is not None:
+        qs = qs.filter(Q(match__date__gt=desde) | Q(recommended_at__gt=desde))
+
+    return list(
+        qs.annotate(closing_price=Subquery(closing))
+        .values_list("id", "bet_type", "match__league_id", "bookmaker_id", "recommended_odd", "closing_price")
+    )
+
+
+def avaliar_clv(full=False):
+    """
+    Calcula o CLV das recomendações de partidas iniciadas (ou criadas) desde a última execução
+    (ou de todas, com `full=True`, refazendo o resumo do zero).
+    Retorna (recomendações avaliadas, com preço de fechamento).
+    """
+    agora = timezone.now()
+    checkpoint, _ = JobCheckpoint.objects.get_or_create(name=CHECKPOINT)
+    desde = None if full else checkpoint.value
+
+    rows = _recomendacoes_com_fechamento(desde, agora)
+    com_fechamento = [r for r in rows if r[5] is not None]
+
+    # CLV de todas as apostas de uma vez
+    odds = np.array([float(r[4]) for r in com_fechamento], dtype=np.float64)
+    closing = np.array([r[5] for r in com_fechamento], dtype=np.float64) / 100
+    clv = (odds / closing - 1) * 100 if len(com_fechamento) else np.zeros(0)
+
+    to_update = []
+    totals = defaultdict(lambda: [0, 0, 0.0])  # (mercado, liga, bookmaker) -> [bets, beat, soma]
+    for (rec_id, market, league_id, bookmaker_id, _, closing_price), value in zip(com_fechamento, clv.tolist()):
+        to_update.append(BetRecommendation(
+            id=rec_id,
+            closing_odd=closing_price / 100,
+            clv=round(value, 4),
+        ))
+        acc = totals[(market, league_id, bookmaker_id)]
+        acc[0] += 1
+        acc[1] += int(value > 0)
+        acc[2] += value
+
+    with transaction.atomic():
+        if full:
+            CLVSummary.objects.all().delete()
+        BetRecommendation.objects.bulk_update(to_update, ["closing_odd", "clv"], batch_size=500)
+
+        # Soma ao acumulado existente e grava por upsert
+        existing = {
+            (s.market, s.league_id, s.bookmaker_id): s
+            for s in CLVSummary.objects.filter(market__in={k[0] for k in totals})
+        }
+        summaries = []
+        for (market, league_id, bookmaker_id), (bets, beat, clv_sum) in totals.items():
+            prev = existing.get((market, league_id, bookmaker_id))
+            if prev is not None:
+                bets += prev.bets
+                beat += prev.beat_closing
+                clv_sum += prev.clv_sum
+            summaries.append(CLVSummary(
+                market=market,
+                league_id=league_id,
+                bookmaker_id=bookmaker_id,
+                bets=bets,
+                beat_closing=beat,
+                clv_sum=clv_sum,
+                avg_clv=round(clv_sum / bets, 4),
+                updated_at=agora,
+            ))
+        CLVSummary.objects.bulk_create(
+            summaries,
+            batch_size=500,
+            update_conflicts=True,
+            unique_fields=["market", "league", "bookmaker"],
+            update_fields=["bets", "beat_closing", "clv_sum", "avg_clv", "updated_at"],
+        )
+
+        checkpoint.value = agora
+        checkpoint.save(update_fields=["value", "updated_at"])
+
+    return len(rows), len(com_fechamento)
@@ -0,0 +1,131 @@
+# FutStats/core/form_cache.py
+
+import threading
+import time
+
+from django.db.models import F
+from django.utils import timezone
+
+from .models import DataVersion
+from .stats_engine import FormEngine, FORM_WINDOW
+from . import form_snapshot
+
+# Nome do contador incrementado pelos importadores quando resultados/estatísticas mudam.
+FORM_VERSION = "team_form"
+
+
+def versao_atual(nome=FORM_VERSION):
+    """Versão atual de um conjunto de dados (0 se o contador ainda não existe)."""
+    return DataVersion.objects.filter(name=nome).values_list("version", flat=True).first() or 0
+
+
+def incrementar_versao(nome=FORM_VERSION):
+    """Sinaliza para os caches em memória que os dados mudaram."""
+    updated = DataVersion.objects.filter(name=nome).update(
+        version=F("version") + 1,
+        updated_at=timezone.now(),
+    )
+    if not updated:
+        DataVersion.objects.get_or_create(name=nome, defaults={"version": 1})
+
+
+class FormCache:
+    """
+    Cache por processo do FormEngine de TODOS os times, por `sample_limit`.
+
+    Cada leitura faz só a consulta de versão (DataVersion); o engine é reconstruído
+    apenas quando a versão muda (novo resultado/estatística importado). Na troca de
+    versão, usa o snapshot mmap gravado pelo `precomputar_analises` quando ele é da
+    versão atual, e só consulta o banco se não houver snapshot válido.
+
+    O engine base tem profundidade FORM_WINDOW; amostras menores são recortes dele
+    (`FormEngine.recortar`), sem nova carga.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}  # sample_limit -> (versao, engine)
+
+        self.hits = 0
+        self.misses = 0
+        self.snapshot_loads = 0
+        self.last_rebuild_seconds = None
+        self.last_rebuild_at = None
+
+    def get(self, sample_limit=5):
+        versao = versao_atual()
+
+        with self._lock:
+            entry = self._entries.get(sample_limit)
+            if entry and entry[0] == versao:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        inicio = time.perf_counter()
+        engine = self._engine_base(versao).recortar(sample_limit)
+        elapsed = time.perf_counter() - inicio
+
+        with self._lock:
+            self._entries[sample_limit] = (versao, engine)
+            self.last_rebuild_seconds = round(elapsed, 4)
+            self.last_rebuild_at = timezone.now()
+
+        return engine
+
+    def _engine_base(self, versao):
+        """Engine de profundidade FORM_WINDOW da versão atual (snapshot ou banco)."""
+        with self._lock:
+            entry = self._entries.get(FORM_WINDOW)
+        if entry and entry[0] == versao:
+            return entry[1]
+
+        engine = self._carregar_snapshot(versao)
+        if engine is None:
+            engine = FormEngine.carregar(limit=FORM_WINDOW).carregar_cartoes_escanteios()
+
+        with self._lock:
+            self._entries[FORM_WINDOW] = (versao, engine)
+        return engine
+
+    def _carregar_snapshot(self, versao):
+        header = form_snapshot.ler_header()
+        if (
+            header is None
+            or header["data_version"] != versao
+            or header["limit"] != FORM_WINDOW
+            or not header["flags"] & form_snapshot.FLAG_CARTOES_ESCANTEIOS
+        ):
+            return None
+
+        engine, header = form_snapshot.carregar_snapshot()
+        # O arquivo pode ter sido trocado entre a leitura do header e o mmap.
+        if engine is None or header["data_version"] != versao or header["limit"] != FORM_WINDOW:
+            return None
+
+        with self._lock:
+            self.snapshot_loads += 1
+        return engine
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "snapshot_loads": self.snapshot_loads,
+                "entries": {limit: versao for limit, (versao, _) in self._entries.items()},
+                "last_rebuild_seconds": self.last_rebuild_seconds,
+                "last_rebuild_at": self.last_rebuild_at.isoformat() if self.last_rebuild_at else None,
+            }
+
+
+form_cache = FormCache()
+
+
+def get_form_engine(sample_limit=5):
+    """FormEngine de todos os times (com cartões/escanteios), reaproveitado entre requests."""
+    return form_cache.get(sample_limit)
@@ -0,0 +1,190 @@
+# FutStats/core/form_snapshot.py
+"""
+Snapshot binário da forma dos times, compartilhado entre os workers do gunicorn.
+
+O `precomputar_analises` grava o arquivo (troca atômica via os.replace) e cada
+worker o mapeia em memória somente leitura (mmap): todos compartilham a mesma
+cópia no page cache, sem reconstruir a forma a partir do banco.
+
+Layout (little-endian):
+- header de 64 bytes: magic, formato, n_teams, limit, flags, data_version, generated_at
+- seções alinhadas em 8 bytes, na ordem de `_SECOES`:
+  team_ids int64[n], sample_size int16[n] e matrizes [n, limit] de
+  goals_for/goals_against/cards/corners (int16) e dates/match_ids (int64)
+"""
+
+import mmap
+import os
+import struct
+import tempfile
+import time
+
+import numpy as np
+from django.conf import settings
+
+from .stats_engine import FormEngine, FORM_WINDOW
+
+MAGIC = b"FSFORM\x00\x01"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<8sIIIIqq")
+HEADER_SIZE = 64
+
+FLAG_CARTOES_ESCANTEIOS = 1
+
+# (nome, dtype, é matriz [n, limit]?)
+_SECOES = [
+    ("team_ids", np.int64, False),
+    ("sample_size", np.int16, False),
+    ("goals_for", np.int16, True),
+    ("goals_against", np.int16, True),
+    ("cards", np.int16, True),
+    ("corners", np.int16, True),
+    ("dates", np.int64, True),
+    ("match_ids", np.int64, True),
+]
+
+
+def snapshot_path():
+    return getattr(settings, "FORM_SNAPSHOT_PATH", None)
+
+
+def _alinhar(offset):
+    return (offset + 7) & ~7
+
+
+def escrever_snapshot(engine, data_version, path=None):
+    """
+    Grava o engine no arquivo de snapshot. Escreve em um arquivo temporário no mesmo
+    diretório e troca com os.replace, então leitores nunca veem um arquivo pela metade.
+    """
+    path = path or snapshot_path()
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    n_teams = len(engine.team_ids)
+    flags = FLAG_CARTOES_ESCANTEIOS if engine.cards is not None else 0
+
+    arrays = {
+        "team_ids": engine.team_ids,
+        "sample_size": engine.sample_size[:-1],
+        "goals_for": engine.goals_for,
+        "goals_against": engine.goals_against,
+        "cards": engine.cards if engine.cards is not None else np.zeros_like(engine.goals_for),
+        "corners": engine.corners if engine.corners is not None else np.full_like(engine.goals_for, -1),
+        "dates": engine.dates,
+        "match_ids": engine.match_ids,
+    }
+
+    fd, tmp_path = tempfile.mkstemp(prefix=".team_form.", dir=os.path.dirname(path) or ".")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            header = HEADER.pack(
+                MAGIC, FORMAT_VERSION, n_teams, engine.limit, flags,
+                int(data_version), int(time.time()),
+            )
+            f.write(header.ljust(HEADER_SIZE, b"\0"))
+
+            offset = HEADER_SIZE
+            for name, dtype, _ in _SECOES:
+                data = np.ascontiguousarray(arrays[name], dtype=np.dtype(dtype).newbyteorder("<"))
+                f.write(data.tobytes())
+                offset += data.nbytes
+                padding = _alinhar(offset) - offset
+                f.write(b"\0" * padding)
+                offset += padding
+
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp cria com 0600: workers da API podem rodar com outro usuário.
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    return path
+
+
+def _parse_header(raw):
+    if len(raw) < HEADER.size:
+        return None
+
+    magic, fmt, n_teams, limit, flags, data_version, generated_at = HEADER.unpack(raw)
+    if magic != MAGIC or fmt != FORMAT_VERSION:
+        return None
+
+    return {
+        "n_teams": n_teams,
+        "limit": limit,
+        "flags": flags,
+        "data_version": data_version,
+        "generated_at": generated_at,
+    }
+
+
+def ler_header(path=None):
+    """Retorna o header do snapshot como dict (ou None se o arquivo não existe/é inválido)."""
+    path = path or snapshot_path()
+    try:
+        with open(path, "rb") as f:
+            return _parse_header(f.read(HEADER.size))
+    except OSError:
+        return None
+
+
+def carregar_snapshot(path=None):
+    """
+    Mapeia o snapshot (somente leitura) e monta um FormEngine cujas matrizes são
+    views sobre o mmap (sem cópia). Retorna (engine, header) ou (None, None).
+    """
+    path = path or snapshot_path()
+    try:
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None, None
+
+    # Header lido do próprio mmap: mesmo arquivo (inode) das seções, mesmo com troca atômica.
+    header = _parse_header(mm[:HEADER.size])
+    if header is None:
+        mm.close()
+        return None, None
+
+    n_teams, limit = header["n_teams"], header["limit"]
+    arrays = {}
+    offset = HEADER_SIZE
+    for name, dtype, is_matrix in _SECOES:
+        count = n_teams * limit if is_matrix else n_teams
+        dt = np.dtype(dtype).newbyteorder("<")
+        arr = np.frombuffer(mm, dtype=dt, count=count, offset=offset)
+        arrays[name] = arr.reshape((n_teams, limit)) if is_matrix else arr
+        offset = _alinhar(offset + arr.nbytes)
+
+    engine = FormEngine(
+        arrays["team_ids"],
+        arrays["goals_for"],
+        arrays["goals_against"],
+        arrays["dates"],
+        arrays["match_ids"],
+        arrays["sample_size"],
+        limit,
+    )
+    if header["flags"] & FLAG_CARTOES_ESCANTEIOS:
+        engine.cards = arrays["cards"]
+        engine.corners = arrays["corners"]
+        engine._calcular_cartoes_escanteios()
+
+    return engine, header
+
+
+def gerar_snapshot(sample_limit=FORM_WINDOW, path=None):
+    """
+    Monta o engine de TODOS os times (com cartões/escanteios) e grava o snapshot,
+    marcado com a versão atual dos dados de forma. Por padrão usa a profundidade
+    FORM_WINDOW, da qual os workers recortam qualquer amostra.
+    """
+    from .form_cache import versao_atual
+
+    versao = versao_atual()
+    engine = FormEngine.carregar(limit=sample_limit).carregar_cartoes_escanteios()
+    return escrever_snapshot(engine, versao, path=path), len(engine.team_ids)
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from core.clv import avaliar_clv
+from core.models import CLVSummary
+
+
+class Command(BaseCommand):
+    help = (
+        "Calcula o closing line value (CLV) das recomendações de partidas que começaram "
+        "desde a última execução e atualiza o resumo por mercado/liga/bookmaker."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Reprocessa todas as partidas já iniciadas e refaz o resumo do zero.",
+        )
+
+    def handle(self, *args, **opts):
+        avaliadas, com_fechamento = avaliar_clv(full=bool(opts.get("full")))
+        self.stdout.write(
+            f"Recomendações avaliadas: {avaliadas}. Com preço de fechamento: {com_fechamento}."
+        )
+
+        for s in (
+            CLVSummary.objects.select_related("league", "bookmaker")
+            .order_by("-avg_clv")[:20]
+        ):
+            self.stdout.write(
+                f"   {s.market} | {s.league.name} | {s.bookmaker.name}: "
+                f"CLV médio {s.avg_clv:+.2f}% em {s.bets} apostas ({s.beat_closing} bateram o fechamento)"
+            )
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import time
+from decimal import Decimal
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from core.betting_utils import (
+    calcular_ev_lote,
+    calculate_expected_value,
+    calculate_value_percentage,
+    odd_to_implied_probability,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara o cálculo de EV por odd (Decimal) com o motor em lote (NumPy) "
+        "numa janela sintética de partidas x bookmakers x mercados (não acessa o banco)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--matches",
+            type=int,
+            default=300,
+            help="Partidas na janela sintética (default: 300).",
+        )
+        parser.add_argument(
+            "--bookmakers",
+            type=int,
+            default=40,
+            help="Bookmakers por partida (default: 40).",
+        )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=42,
+            help="Semente do gerador aleatório (default: 42).",
+        )
+
+    def handle(self, *args, **opts):
+        n_matches = max(1, int(opts.get("matches") or 300))
+        n_bookmakers = max(1, int(opts.get("bookmakers") or 40))
+        rng = np.random.default_rng(opts.get("seed", 42))
+
+        # 2 mercados (over_25 / btts_yes) por partida x bookmaker
+        n = n_matches * n_bookmakers * 2
+        probs = np.repeat(rng.uniform(20, 80, size=n_matches * 2), n_bookmakers)
+        odds = np.round(rng.uniform(1.2, 4.0, size=n), 2)
+
+        # Caminho antigo: uma odd por vez, em Decimal
+        inicio = time.perf_counter()
+        escalar = []
+        for prob, odd in zip(probs.tolist(), odds.tolist()):
+            implied = odd_to_implied_probability(odd)
+            ev = calculate_expected_value(prob, odd)
+            value_pct = calculate_value_percentage(prob, implied)
+            if ev and ev > 0:
+                confidence = "high" if value_pct > 10 else "medium" if value_pct > 5 else "low"
+                escalar.append((Decimal(str(ev)), confidence))
+        tempo_escalar = time.perf_counter() - inicio
+
+        # Motor em lote
+        inicio = time.perf_counter()
+        result = calcular_ev_lote(probs, odds)
+        valor = np.flatnonzero(result["expected_value"] > 1e-9)
+        tempo_lote = time.perf_counter() - inicio
+
+        self.stdout.write(f"Apostas candidatas: {n} ({n_matches} partidas x {n_bookmakers} bookmakers x 2 mercados)")
+        self.stdout.write(f"Value bets: escalar={len(escalar)} lote={len(valor)}")
+        self.stdout.write(f"Escalar (Decimal): {tempo_escalar * 1000:.1f} ms")
+        self.stdout.write(f"Lote (NumPy):      {tempo_lote * 1000:.1f} ms")
+        if tempo_lote > 0:
+            self.stdout.write(self.style.SUCCESS(f"Speedup: {tempo_escalar / tempo_lote:.1f}x"))
@@ -11,6 +11,7 @@ from django.utils import timezone
 from dotenv import load_dotenv
 from telegram import Bot
 
+from core.betting_utils import dimensionar_carteira
 from core.models import BetRecommendation
 
 
@@ -75,6 +76,12 @@ class Command(BaseCommand):
             default=os.environ.get("SITE_URL") or os.environ.get("VITE_SITE_URL") or "",
             help="URL pública do site (ex.: https://seu-dominio.com).",
         )
+        parser.add_argument(
+            "--bankroll",
+            type=float,
+            default=0,
+            help="Banca para mostrar o stake sugerido em valor (opcional; sempre mostra o % da banca).",
+        )
         parser.add_argument(
             "--dry-run",
             action="store_true",
@@ -107,7 +114,12 @@ class Command(BaseCommand):
         else:
             qs = qs.order_by("-created_at")
 
-        recs = qs[:limit]
+        # Stake sugerido (Kelly fracionado com tetos) sobre todas as value bets da janela
+        portfolio = list(qs) if mode == "window" else list(qs[:limit])
+        stakes = dimensionar_carteira(portfolio)
+        bankroll = float(opts.get("bankroll") or 0)
+
+        recs = portfolio[:limit]
 
         if not recs:
             # Evitar emojis aqui: no Windows (cp1252) pode causar UnicodeEncodeError no terminal.
@@ -127,7 +139,7 @@ class Command(BaseCommand):
         header += "Top oportunidades por EV (informativo — apostas envolvem risco).\n\n"
 
         lines = [header]
-        for i, r in enumerate(recs, 1):
+        for i, (r, stake) in enumerate(zip(recs, stakes.tolist()), 1):
             m = r.match
             home = getattr(getattr(m, "home_team", None), "name", "") or "Casa"
             away = getattr(getattr(m, "away_team", None), "name", "") or "Fora"
@@ -154,6 +166,11 @@ class Command(BaseCommand):
             lines.append(
                 f"Prob: {_fmt_pct(r.calculated_probability)} • Implícita: {_fmt_pct(r.implied_probability)} • EV: {_fmt_pct(r.expected_value)}"
             )
+            if stake > 0:
+                stake_line = f"Stake sugerido: {_fmt_pct(stake * 100)} da banca"
+                if bankroll > 0:
+                    stake_line += f" ({stake * bankroll:.2f})"
+                lines.append(stake_line)
             if url:
                 lines.append(f"<a href=\"{html.escape(url)}\">Abrir no FutStats</a>")
             lines.append("")  # linha em branco
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+from datetime import datetime, time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.analises import salvar_analises
+from core.models import Match, PendingAnalysis
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula as análises das partidas na fila de reanálise (PendingAnalysis), "
+        "preenchida pelos importadores de odds, partidas e estatísticas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=200,
+            help="Partidas consumidas da fila por lote (default: 200).",
+        )
+        parser.add_argument(
+            "--sample-limit",
+            type=int,
+            default=5,
+            help="Quantidade de jogos no cache por time (default: 5, max: 20).",
+        )
+
+    def handle(self, *args, **opts):
+        batch_size = max(1, int(opts.get("batch_size", 200) or 200))
+        sample_limit = max(1, min(int(opts.get("sample_limit", 5) or 5), 20))
+
+        inicio_hoje = timezone.make_aware(datetime.combine(timezone.localdate(), time.min))
+
+        total_upserts = 0
+        total_skipped = 0
+        total_descartadas = 0
+        last_id = 0
+
+        while True:
+            pendentes = list(
+                PendingAnalysis.objects
+                .filter(id__gt=last_id)
+                .order_by("id")
+                .values_list("id", "match_id", "queued_at")[:batch_size]
+            )
+            if not pendentes:
+                break
+            last_id = pendentes[-1][0]
+
+            match_ids = [match_id for _, match_id, _ in pendentes]
+
+            # Só partidas a partir de hoje têm análise; as demais apenas saem da fila.
+            matches = list(
+                Match.objects.select_related("home_team", "away_team", "league")
+                .filter(id__in=match_ids, date__gte=inicio_hoje)
+                .order_by("date")
+            )
+            total_descartadas += len(match_ids) - len(matches)
+
+            upserts, skipped = salvar_analises(matches, sample_limit=sample_limit)
+            total_upserts += upserts
+            total_skipped += skipped
+
+            # Remove só o que foi lido: se um importador reenfileirou a partida
+            # durante o cálculo, `queued_at` mudou e ela continua na fila.
+            lido_ate = max(queued_at for _, _, queued_at in pendentes)
+            PendingAnalysis.objects.filter(
+                id__in=[pid for pid, _, _ in pendentes],
+                queued_at__lte=lido_ate,
+            ).delete()
+
+            self.stdout.write(
+                f"Lote: {len(pendentes)} pendentes, {upserts} análises atualizadas, {skipped} sem mudança."
+            )
+
+        self.stdout.write(
+            f"Fila processada. Análises atualizadas: {total_upserts}. "
+            f"Sem mudança: {total_skipped}. Fora da janela (descartadas): {total_descartadas}."
+        )
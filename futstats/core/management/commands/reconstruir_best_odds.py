@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.markets import MARKETS_BY_KEY, ODD_FIELDS
+from core.models import MatchOdds, OddsQuote
+from core.utils import atualizar_best_odds
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstrói as BestOdds (melhor preço por partida/mercado) a partir das OddsQuote. "
+        "Odds antigas, só em MatchOdds, viram OddsQuote antes. Necessário apenas na carga "
+        "inicial ou após correções; o importar_odds mantém a tabela atualizada."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Partidas por lote (default: 500).",
+        )
+
+    def handle(self, *args, **opts):
+        batch_size = max(1, int(opts.get("batch_size", 500) or 500))
+
+        # 1) MatchOdds sem cotações em formato longo (importadas antes do OddsQuote)
+        com_cotacao = set(OddsQuote.objects.values_list("match_id", "bookmaker_id").distinct())
+        quotes = []
+        for row in MatchOdds.objects.values_list(
+            "match_id", "bookmaker_id", "last_updated", *[field for _, field in ODD_FIELDS]
+        ).iterator():
+            match_id, bookmaker_id, last_updated, *values = row
+            if (match_id, bookmaker_id) in com_cotacao:
+                continue
+            for (key, _), price in zip(ODD_FIELDS, values):
+                if price is None:
+                    continue
+                market = MARKETS_BY_KEY[key]
+                quotes.append(OddsQuote(
+                    match_id=match_id,
+                    bookmaker_id=bookmaker_id,
+                    market=market.api_market,
+                    line=market.line,
+                    outcome=market.outcome,
+                    price=price,
+                    fetched_at=last_updated,
+                ))
+        with transaction.atomic():
+            OddsQuote.objects.bulk_create(quotes, batch_size=1000)
+        self.stdout.write(f"Cotações criadas a partir de MatchOdds: {len(quotes)}.")
+
+        # 2) BestOdds em lotes de partidas
+        match_ids = sorted(set(OddsQuote.objects.values_list("match_id", flat=True).distinct()))
+        total = 0
+        for i in range(0, len(match_ids), batch_size):
+            total += atualizar_best_odds(match_ids[i:i + batch_size])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"BestOdds reconstruído: {total} mercados em {len(match_ids)} partidas."
+        ))
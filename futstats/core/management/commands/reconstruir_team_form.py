@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core.utils import FORM_WINDOW, reconstruir_team_form
+
+
+class Command(BaseCommand):
+    help = (
+        f"Reconstrói a forma recente (TeamForm, últimos {FORM_WINDOW} jogos) de todos os times "
+        "a partir das partidas finalizadas. Necessário apenas na carga inicial ou após correções."
+    )
+
+    def handle(self, *args, **opts):
+        total = reconstruir_team_form()
+        self.stdout.write(self.style.SUCCESS(f"TeamForm reconstruído para {total} times."))
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import time as _time
+from datetime import datetime, time, timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.arbitragem import escanear_arbitragem
+
+
+class Command(BaseCommand):
+    help = (
+        "Procura arbitragens (surebets) entre bookmakers nas partidas da janela: "
+        "melhor preço de cada resultado com soma de 1/odd abaixo de 1."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days-ahead",
+            type=int,
+            default=3,
+            help="Janela de dias a partir de hoje (default: 3, max: 7).",
+        )
+        parser.add_argument(
+            "--league",
+            type=str,
+            default="",
+            help="Filtra por nome exato da liga (opcional).",
+        )
+        parser.add_argument(
+            "--min-profit",
+            type=float,
+            default=0.0,
+            help="Lucro garantido mínimo em %% (default: 0).",
+        )
+        parser.add_argument(
+            "--stake",
+            type=float,
+            default=100.0,
+            help="Total a distribuir entre as pernas (default: 100).",
+        )
+
+    def handle(self, *args, **opts):
+        days_ahead = max(1, min(int(opts.get("days_ahead", 3) or 3), 7))
+        league = (opts.get("league") or "").strip()
+        stake = opts.get("stake") or 100.0
+
+        inicio = timezone.make_aware(datetime.combine(timezone.localdate(), time.min))
+        fim = inicio + timedelta(days=days_ahead)
+
+        t0 = _time.perf_counter()
+        oportunidades = escanear_arbitragem(
+            inicio, fim, league=league, min_profit=opts.get("min_profit") or 0.0, stake=stake
+        )
+        elapsed_ms = (_time.perf_counter() - t0) * 1000
+
+        for op in oportunidades:
+            self.stdout.write(
+                f"{op['match']} ({op['league']}) - {op['market_label']}: "
+                f"lucro {op['profit_pct']:.2f}% (soma 1/odd {op['inverse_sum']:.4f}, retorno {op['payout']:.2f})"
+            )
+            for leg in op["legs"]:
+                self.stdout.write(
+                    f"   {leg['label']}: odd {leg['odd']:.2f} @ {leg['bookmaker']} -> apostar {leg['stake']:.2f}"
+                )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Arbitragens encontradas: {len(oportunidades)} (busca em {elapsed_ms:.1f} ms)."
+        ))
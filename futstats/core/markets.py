@@ -0,0 +1,161 @@
+# FutStats/core/markets.py
+"""
+Registro de mercados de odds.
+
+Cada cotação da The Odds API vira uma linha em `OddsQuote`
+(mercado da API, linha, resultado, preço). O registro mapeia essas linhas para
+chaves estáveis do FutStats ("home_win", "over_25", "handicap_home_-1.5", ...)
+e é a fonte única para:
+- o parsing das respostas da API (`parse_cotacoes`)
+- a seleção do melhor preço por mercado (`BestOdds`, via `utils.atualizar_best_odds`)
+- as colunas legadas de `MatchOdds` e a saída das APIs (`ODD_FIELDS`, `label`)
+
+Novos totais/mercados entram aqui, sem migration.
+"""
+
+from decimal import Decimal, InvalidOperation
+from typing import NamedTuple, Optional
+
+# Mercados pedidos à The Odds API (BTTS não está disponível no plano gratuito)
+API_MARKETS = "h2h,totals,spreads"
+
+# Linhas de Over/Under armazenadas
+TOTALS_LINES = ["0.5", "1.5", "2.5", "3.5", "4.5", "5.5"]
+
+
+class Market(NamedTuple):
+    key: str                      # chave no FutStats (best_by_market, probabilities, MarketEdge)
+    api_market: str               # "h2h" | "totals" | "spreads" | "btts"
+    outcome: str                  # "home" | "draw" | "away" | "over" | "under" | "yes" | "no"
+    line: Optional[Decimal]       # linha de totals/handicap; None em h2h/btts
+    label: str
+    odd_field: Optional[str] = None  # coluna legada em MatchOdds (se houver)
+
+
+def _linha_key(line):
+    """2.5 -> "25" (over_25), 0.5 -> "05"."""
+    return str(line).replace(".", "")
+
+
+def _handicap(outcome, line):
+    linha = f"{float(line):+g}"  # -1.50 -> "-1.5", 0 -> "+0"
+    return Market(
+        key=f"handicap_{outcome}_{linha}",
+        api_market="spreads",
+        outcome=outcome,
+        line=Decimal(linha),
+        label=f"Handicap {'Casa' if outcome == 'home' else 'Fora'} ({linha})",
+    )
+
+
+MARKETS = [
+    Market("home_win", "h2h", "home", None, "Casa (1)", "home_win_odd"),
+    Market("draw", "h2h", "draw", None, "Empate (X)", "draw_odd"),
+    Market("away_win", "h2h", "away", None, "Fora (2)", "away_win_odd"),
+]
+for _line in TOTALS_LINES:
+    _legacy = _line == "2.5"
+    MARKETS += [
+        Market(f"over_{_linha_key(_line)}", "totals", "over", Decimal(_line),
+               f"Mais de {_line} Gols", "over_25_odd" if _legacy else None),
+        Market(f"under_{_linha_key(_line)}", "totals", "under", Decimal(_line),
+               f"Menos de {_line} Gols", "under_25_odd" if _legacy else None),
+    ]
+MARKETS += [
+    Market("btts_yes", "btts", "yes", None, "Ambos Marcam (BTTS)", "btts_yes_odd"),
+    Market("btts_no", "btts", "no", None, "Ambos Marcam - Não", "btts_no_odd"),
+]
+
+MARKETS_BY_KEY = {m.key: m for m in MARKETS}
+_MARKETS_BY_QUOTE = {(m.api_market, m.outcome, m.line): m for m in MARKETS}
+
+# Conjuntos completos de resultados (exatamente um acontece): { chave: (rótulo, mercados) }.
+# Usados na busca de arbitragem (`core.arbitragem`).
+OUTCOME_SETS = {"1x2": ("1X2", ["home_win", "draw", "away_win"])}
+for _line in TOTALS_LINES:
+    OUTCOME_SETS[f"totals_{_linha_key(_line)}"] = (
+        f"Gols {_line}", [f"over_{_linha_key(_line)}", f"under_{_linha_key(_line)}"]
+    )
+OUTCOME_SETS["btts"] = ("Ambos Marcam", ["btts_yes", "btts_no"])
+
+# (chave, coluna de MatchOdds) dos mercados com coluna legada, na ordem da API de odds
+ODD_FIELDS = [(m.key, m.odd_field) for m in MARKETS if m.odd_field]
+ODD_FIELD = dict(ODD_FIELDS)
+
+
+def get_market(key):
+    """Mercado pela chave; handicaps ("handicap_home_-1.5") são montados na hora."""
+    market = MARKETS_BY_KEY.get(key)
+    if market is None and key.startswith("handicap_"):
+        try:
+            _, outcome, line = key.split("_", 2)
+            return _handicap(outcome, Decimal(line))
+        except (ValueError, InvalidOperation):
+            return None
+    return market
+
+
+def market_for(api_market, outcome, line=None):
+    """Mercado de uma cotação (api_market, outcome, line); None se não suportado."""
+    if api_market == "spreads":
+        if outcome not in ("home", "away") or line is None:
+            return None
+        return _handicap(outcome, Decimal(line))
+    return _MARKETS_BY_QUOTE.get((api_market, outcome, None if line is None else Decimal(line)))
+
+
+def _nome_bate(name, team_name):
+    team_name = (team_name or "").lower()
+    return bool(team_name) and (team_name in name or name in team_name)
+
+
+def _outcome(api_market, name, home_name, away_name):
+    """Normaliza o nome do resultado da API ("Over", nome do time, "Draw"...)."""
+    if api_market in ("h2h", "spreads"):
+        # Tentar identificar qual time é qual
+        if _nome_bate(name, home_name):
+            return "home"
+        if _nome_bate(name, away_name):
+            return "away"
+        if "draw" in name or "empate" in name or "tie" in name:
+            return "draw"
+    elif api_market == "totals":
+        if "over" in name:
+            return "over"
+        if "under" in name:
+            return "under"
+    elif api_market == "btts":
+        if "yes" in name or "sim" in name:
+            return "yes"
+        if "no" in name or "não" in name:
+            return "no"
+    return None
+
+
+def parse_cotacoes(bookmaker_data, home_name, away_name):
+    """
+    Cotações suportadas de um bookmaker de um evento da The Odds API.
+    Retorna [(Market, preço Decimal)]; linhas fora do registro são ignoradas.
+    """
+    quotes = []
+    for api_market in bookmaker_data.get("markets", []):
+        market_key = api_market.get("key")
+        for outcome in api_market.get("outcomes", []):
+            price = outcome.get("price")
+            if not price:
+                continue
+
+            point = outcome.get("point")
+            if market_key in ("totals", "spreads"):
+                if point is None:
+                    continue
+                line = Decimal(str(point))
+            else:
+                line = None
+
+            name = (outcome.get("name") or "").lower()
+            market = market_for(market_key, _outcome(market_key, name, home_name, away_name), line)
+            if market is not None:
+                quotes.append((market, Decimal(str(price))))
+    return quotes
+
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.1 on 2026-10-18 10:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_matchanalysis'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TeamForm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('results', models.JSONField(default=list)),
+                ('last_match_date', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('team', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='form', to='core.team')),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 10:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_dataversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='matchanalysis',
+            name='input_fingerprint',
+            field=models.CharField(blank=True, default='', max_length=40),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.1 on 2026-10-18 10:16
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_matchanalysis_input_fingerprint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarketEdge',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kickoff', models.DateTimeField()),
+                ('market', models.CharField(max_length=20)),
+                ('calculated_probability', models.FloatField()),
+                ('best_odd', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('implied_probability', models.FloatField()),
+                ('edge', models.FloatField()),
+                ('bookmaker', models.CharField(blank=True, max_length=100, null=True)),
+                ('is_brazilian_bookmaker', models.BooleanField(default=False)),
+                ('computed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('league', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='core.league')),
+                ('match', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='market_edges', to='core.match')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kickoff', 'calculated_probability'], name='core_market_kickoff_066ab1_idx')],
+                'unique_together': {('match', 'market')},
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.1 on 2026-10-18 10:17
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_marketedge'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingAnalysis',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reason', models.CharField(max_length=20)),
+                ('queued_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('match', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='pending_analysis', to='core.match')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['queued_at'], name='core_pendin_queued__cc7fd7_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.1 on 2026-10-18 10:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_pendinganalysis'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='marketedge',
+            name='core_market_kickoff_066ab1_idx',
+        ),
+        migrations.AlterUniqueTogether(
+            name='marketedge',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='marketedge',
+            name='engine',
+            field=models.CharField(default='heuristica:1', max_length=40),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='matchanalysis',
+            name='engine_probabilities',
+            field=models.JSONField(default=dict),
+        ),
+        migrations.AlterUniqueTogether(
+            name='marketedge',
+            unique_together={('match', 'engine', 'market')},
+        ),
+        migrations.AddIndex(
+            model_name='marketedge',
+            index=models.Index(fields=['engine', 'kickoff', 'calculated_probability'], name='core_market_engine_829023_idx'),
+        ),
+    ]
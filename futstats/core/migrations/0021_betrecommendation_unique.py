@@ -0,0 +1,41 @@
+# Generated by Django 5.2.1 on 2026-10-18 10:24
+
+from django.db import migrations
+
+
+def remover_duplicadas(apps, schema_editor):
+    """Mantém só a recomendação mais recente de cada (match, bet_type, bookmaker)."""
+    BetRecommendation = apps.get_model('core', 'BetRecommendation')
+
+    vistos = set()
+    duplicadas = []
+    rows = (
+        BetRecommendation.objects
+        .order_by('match_id', 'bet_type', 'bookmaker_id', '-id')
+        .values_list('id', 'match_id', 'bet_type', 'bookmaker_id')
+        .iterator()
+    )
+    for pk, match_id, bet_type, bookmaker_id in rows:
+        key = (match_id, bet_type, bookmaker_id)
+        if key in vistos:
+            duplicadas.append(pk)
+        else:
+            vistos.add(key)
+
+    for i in range(0, len(duplicadas), 1000):
+        BetRecommendation.objects.filter(id__in=duplicadas[i:i + 1000]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_probability_engines'),
+    ]
+
+    operations = [
+        migrations.RunPython(remover_duplicadas, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='betrecommendation',
+            unique_together={('match', 'bet_type', 'bookmaker')},
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.1 on 2026-10-18 10:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_betrecommendation_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OddsQuote',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('market', models.CharField(max_length=20)),
+                ('line', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('outcome', models.CharField(max_length=10)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('fetched_at', models.DateTimeField()),
+                ('bookmaker', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.bookmaker')),
+                ('match', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='quotes', to='core.match')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['match', 'market', 'line', 'outcome', '-price'], name='core_oddsqu_match_i_a09fe3_idx')],
+            },
+        ),
+    ]
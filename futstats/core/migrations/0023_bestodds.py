@@ -0,0 +1,28 @@
+# Generated by Django 5.2.1 on 2026-10-18 10:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_oddsquote'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BestOdds',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('market', models.CharField(max_length=40)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('fetched_at', models.DateTimeField()),
+                ('bookmaker', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.bookmaker')),
+                ('match', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='best_odds', to='core.match')),
+            ],
+            options={
+                'unique_together': {('match', 'market')},
+            },
+        ),
+    ]
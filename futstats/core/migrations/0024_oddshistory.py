@@ -0,0 +1,28 @@
+# Generated by Django 5.2.1 on 2026-10-18 10:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0023_bestodds'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OddsHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('market', models.CharField(max_length=40)),
+                ('price', models.PositiveIntegerField()),
+                ('fetched_at', models.DateTimeField()),
+                ('bookmaker', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.bookmaker')),
+                ('match', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='odds_history', to='core.match')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['match', 'market', 'fetched_at'], name='core_oddshi_match_i_c73c55_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.1 on 2026-10-18 10:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0024_oddshistory'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('value', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='betrecommendation',
+            name='closing_odd',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=6, null=True),
+        ),
+        migrations.AddField(
+            model_name='betrecommendation',
+            name='clv',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='CLVSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('market', models.CharField(max_length=50)),
+                ('bets', models.PositiveIntegerField(default=0)),
+                ('beat_closing', models.PositiveIntegerField(default=0)),
+                ('clv_sum', models.FloatField(default=0.0)),
+                ('avg_clv', models.FloatField(default=0.0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('bookmaker', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.bookmaker')),
+                ('league', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='clv_summaries', to='core.league')),
+            ],
+            options={
+                'unique_together': {('market', 'league', 'bookmaker')},
+            },
+        ),
+    ]
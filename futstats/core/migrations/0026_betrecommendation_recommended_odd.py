@@ -0,0 +1,34 @@
+# Generated by Django 5.2.1 on 2026-10-18 14:05
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def preencher_preco_recomendado(apps, schema_editor):
+    """Recomendações existentes: melhor aproximação é o preço atual e a data de criação."""
+    BetRecommendation = apps.get_model('core', 'BetRecommendation')
+    BetRecommendation.objects.filter(recommended_odd__isnull=True).update(
+        recommended_odd=F('odd_value'),
+        recommended_at=F('created_at'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0025_closing_line_value'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='betrecommendation',
+            name='recommended_odd',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=6, null=True),
+        ),
+        migrations.AddField(
+            model_name='betrecommendation',
+            name='recommended_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(preencher_preco_recomendado, migrations.RunPython.noop),
+    ]
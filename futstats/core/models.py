@@ -163,6 +163,77 @@ class MatchOdds(models.Model):
         return f"{self.match} - {self.bookmaker.name}"
 
 
+class OddsQuote(models.Model):
+    """
+    Cotação em formato longo: uma linha por (partida, bookmaker, mercado, linha, resultado).
+    Guarda todos os totais e handicaps da The Odds API; o mapeamento para as chaves
+    do FutStats fica em `core.markets`. Regravada a cada importação do evento.
+    """
+
+    match = models.ForeignKey(Match, on_delete=models.CASCADE, related_name='quotes')
+    bookmaker = models.ForeignKey(Bookmaker, on_delete=models.CASCADE)
+    market = models.CharField(max_length=20)  # mercado da API: 'h2h', 'totals', 'spreads', 'btts'
+    line = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)  # totals/handicap
+    outcome = models.CharField(max_length=10)  # 'home', 'draw', 'away', 'over', 'under', 'yes', 'no'
+    price = models.DecimalField(max_digits=6, decimal_places=2)
+    fetched_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            # Melhor preço por mercado/linha/resultado de uma partida
+            models.Index(fields=['match', 'market', 'line', 'outcome', '-price']),
+        ]
+
+    def __str__(self):
+        return f"{self.match} - {self.market} {self.outcome} {self.line or ''} @ {self.price}"
+
+
+class BestOdds(models.Model):
+    """
+    Melhor preço atual por (partida, mercado), com a chave do registro de mercados
+    (`core.markets`). Mantido pelo importador de odds junto com as OddsQuote
+    (`atualizar_best_odds`); os leitores buscam pela chave, sem varrer bookmakers.
+    """
+
+    match = models.ForeignKey(Match, on_delete=models.CASCADE, related_name='best_odds')
+    market = models.CharField(max_length=40)  # 'home_win', 'over_35', 'handicap_home_-1.5', ...
+    price = models.DecimalField(max_digits=6, decimal_places=2)
+    bookmaker = models.ForeignKey(Bookmaker, on_delete=models.CASCADE)
+    fetched_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('match', 'market')
+
+    def __str__(self):
+        return f"{self.match} - {self.market} @ {self.price}"
+
+
+class OddsHistory(models.Model):
+    """
+    Histórico append-only de preços: uma linha só quando o preço de
+    (partida, bookmaker, mercado) muda em relação ao último visto.
+    Preço em inteiro (odd x 100) para ocupar pouco espaço.
+    """
+
+    match = models.ForeignKey(Match, on_delete=models.CASCADE, related_name='odds_history')
+    bookmaker = models.ForeignKey(Bookmaker, on_delete=models.CASCADE)
+    market = models.CharField(max_length=40)  # chave do registro de mercados (core.markets)
+    price = models.PositiveIntegerField()  # odd x 100 (ex.: 1.95 -> 195)
+    fetched_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['match', 'market', 'fetched_at']),
+        ]
+
+    @property
+    def odd(self):
+        return self.price / 100
+
+    def __str__(self):
+        return f"{self.match} - {self.market} @ {self.odd:.2f} ({self.fetched_at:%d/%m %H:%M})"
+
+
 class BetRecommendation(models.Model):
     match = models.ForeignKey(Match, on_delete=models.CASCADE, related_name='recommendations')
     bet_type = models.CharField(max_length=50)  # 'over_25', 'btts_yes', 'home_win', etc.
@@ -182,9 +253,19 @@ class BetRecommendation(models.Model):
     
     bookmaker = models.ForeignKey(Bookmaker, on_delete=models.CASCADE, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+
+    # Preço e momento da recomendação: gravados só na criação (o `odd_value`
+    # acompanha as odds atuais a cada sincronização)
+    recommended_odd = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True)
+    recommended_at = models.DateTimeField(null=True, blank=True)
+
+    # Closing line value (preenchido pelo `avaliar_clv` após o início da partida)
+    closing_odd = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True)  # último preço antes do jogo
+    clv = models.FloatField(null=True, blank=True)  # % (recommended_odd / odd de fechamento - 1)
     
     class Meta:
         ordering = ['-expected_value']
+        unique_together = ('match', 'bet_type', 'bookmaker')
         indexes = [
             models.Index(fields=['is_value_bet', '-expected_value']),
         ]
@@ -210,8 +291,15 @@ class MatchAnalysis(models.Model):
 
     sample_limit = models.IntegerField(default=5)
 
+    # Hash das entradas (jogos da amostra, sample_limit, versão do modelo, odds):
+    # o `precomputar_analises` só recalcula quando ele muda.
+    input_fingerprint = models.CharField(max_length=40, blank=True, default="")
+
     # Estruturas flexíveis para evoluir sem migrations constantes.
     probabilities = models.JSONField(default=dict)  # { over_25, btts_yes, home_win, draw, away_win }
+    # Probabilidades de todos os engines: { "heuristica:1": {...}, "poisson:1": {...} }
+    # (`probabilities` repete as do engine padrão)
+    engine_probabilities = models.JSONField(default=dict)
     team_rates = models.JSONField(default=dict)  # { home: {...}, away: {...}, sample_limit, quality }
     insights = models.JSONField(default=list)  # lista de insights (dicts)
 
@@ -227,4 +315,130 @@ class MatchAnalysis(models.Model):
         ]
 
     def __str__(self):
-        return f"Analysis: {self.match_id} @ {self.computed_at.isoformat()}"
\ No newline at end of file
+        return f"Analysis: {self.match_id} @ {self.computed_at.isoformat()}"
+
+
+class MarketEdge(models.Model):
+    """
+    Probabilidade calculada x melhor odd de UM mercado de uma partida, por engine
+    de probabilidade (1 linha por partida/engine/mercado), gravada pelo
+    `precomputar_analises`.
+
+    Desnormalizada (kickoff/liga copiados da partida) para o `value_bets` ser
+    uma única consulta indexada com ORDER BY/LIMIT.
+    """
+
+    match = models.ForeignKey(Match, on_delete=models.CASCADE, related_name="market_edges")
+    league = models.ForeignKey(League, on_delete=models.SET_NULL, null=True, blank=True)
+    kickoff = models.DateTimeField()  # cópia de match.date
+
+    engine = models.CharField(max_length=40)  # "nome:versão" (ver prob_engines)
+    market = models.CharField(max_length=20)  # over_25, btts_yes, home_win, draw, away_win
+    calculated_probability = models.FloatField()
+    best_odd = models.DecimalField(max_digits=6, decimal_places=2)
+    implied_probability = models.FloatField()
+    edge = models.FloatField()  # calculated_probability - implied_probability (p.p.)
+
+    bookmaker = models.CharField(max_length=100, null=True, blank=True)
+    is_brazilian_bookmaker = models.BooleanField(default=False)
+
+    computed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = ["match", "engine", "market"]
+        indexes = [
+            models.Index(fields=["engine", "kickoff", "calculated_probability"]),
+        ]
+
+    def __str__(self):
+        return f"Edge: {self.match_id} {self.market} ({self.edge:+.2f})"
+
+
+class PendingAnalysis(models.Model):
+    """
+    Fila de partidas cuja análise precisa ser recalculada (odds novas, resultado
+    novo de um dos times, estatísticas). Preenchida pelos importadores e
+    consumida pelo `reanalisar_pendentes`; 1 linha por partida.
+    """
+
+    match = models.OneToOneField(Match, on_delete=models.CASCADE, related_name="pending_analysis")
+    reason = models.CharField(max_length=20)  # odds, resultado, estatisticas, partida
+    queued_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["queued_at"]),
+        ]
+
+    def __str__(self):
+        return f"Pending: {self.match_id} ({self.reason})"
+
+
+class TeamForm(models.Model):
+    """
+    Forma recente de um time: últimos N jogos FINALIZADOS, mantidos de forma
+    incremental pelos importadores (sem precisar varrer a tabela de partidas).
+
+    `results` vem do jogo mais recente para o mais antigo:
+    [{match_id, date, opponent_id, is_home, goals_for, goals_against, over_25, btts}, ...]
+    """
+
+    team = models.OneToOneField(Team, on_delete=models.CASCADE, related_name="form")
+
+    results = models.JSONField(default=list)
+    last_match_date = models.DateTimeField(null=True, blank=True)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Form: {self.team_id} ({len(self.results)} jogos)"
+
+
+class DataVersion(models.Model):
+    """
+    Contador de versão por conjunto de dados (ex.: "team_form").
+
+    Os importadores incrementam o contador quando os dados mudam; caches em memória
+    comparam só este número (1 consulta por PK) para saber se precisam reconstruir.
+    """
+
+    name = models.CharField(max_length=50, unique=True)
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} v{self.version}"
+
+
+class CLVSummary(models.Model):
+    """
+    Closing line value agregado por (mercado, liga, bookmaker), acumulado
+    incrementalmente pelo `avaliar_clv`.
+    """
+
+    market = models.CharField(max_length=50)  # bet_type da BetRecommendation
+    league = models.ForeignKey(League, on_delete=models.CASCADE, related_name='clv_summaries')
+    bookmaker = models.ForeignKey(Bookmaker, on_delete=models.CASCADE)
+
+    bets = models.PositiveIntegerField(default=0)  # recomendações com preço de fechamento
+    beat_closing = models.PositiveIntegerField(default=0)  # CLV > 0
+    clv_sum = models.FloatField(default=0.0)
+    avg_clv = models.FloatField(default=0.0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('market', 'league', 'bookmaker')
+
+    def __str__(self):
+        return f"{self.market} / {self.league} / {self.bookmaker}: {self.avg_clv:.2f}% ({self.bets})"
+
+
+class JobCheckpoint(models.Model):
+    """Marca d'água de jobs incrementais (ex.: 'clv' = último kickoff processado)."""
+
+    name = models.CharField(max_length=50, unique=True)
+    value = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
@@ -0,0 +1,167 @@
+# FutStats/core/prob_engines.py
+"""
+Registro de engines de probabilidade (Over 2.5 / BTTS / 1X2).
+
+Cada engine recebe as taxas de forma de mandantes e visitantes já carregadas
+(dicts de arrays, formato de `FormEngine.taxas`) e calcula as probabilidades de
+TODAS as partidas em uma passada vetorizada. Assim vários engines rodam sobre os
+mesmos dados, e os resultados ficam lado a lado em `MatchAnalysis.engine_probabilities`,
+chaveados por "nome:versão".
+"""
+
+import math
+
+import numpy as np
+
+# Mercados calculados por todos os engines (mesmas chaves de MatchAnalysis.probabilities).
+MARKETS = ["over_25", "btts_yes", "home_win", "draw", "away_win"]
+
+# Engine cujas probabilidades vão para MatchAnalysis.probabilities e para as APIs sem ?engine=.
+DEFAULT_ENGINE = "heuristica"
+
+_ENGINES = {}
+
+
+def registrar(cls):
+    """Decorator: registra uma instância do engine pelo nome."""
+    engine = cls()
+    _ENGINES[engine.name] = engine
+    return cls
+
+
+def get_engine(name=None):
+    """
+    Engine pelo nome ou pela chave "nome:versão"; None se não existir ou se a
+    versão pedida não for a registrada (resultados são gravados por chave).
+    """
+    name, _, version = (name or DEFAULT_ENGINE).partition(":")
+    engine = _ENGINES.get(name)
+    if engine is None or (version and version != str(engine.version)):
+        return None
+    return engine
+
+
+def engines():
+    """Todos os engines registrados (o padrão primeiro)."""
+    return sorted(_ENGINES.values(), key=lambda e: (e.name != DEFAULT_ENGINE, e.name))
+
+
+class ProbabilityEngine:
+    """
+    Base dos engines. `calcular(home, away)` retorna { mercado: array de % },
+    uma posição por partida. Incrementar `version` quando a fórmula mudar.
+    """
+
+    name = ""
+    version = 1
+
+    @property
+    def key(self):
+        return f"{self.name}:{self.version}"
+
+    def calcular(self, home, away):
+        raise NotImplementedError
+
+
+@registrar
+class HeuristicaEngine(ProbabilityEngine):
+    """
+    Heurística original do sistema:
+    - Over 2.5 / BTTS: média das taxas suavizadas dos dois times
+    - 1X2: base 33.33% + vantagem de casa (+10 / -5) + 8 p.p. por gol de diferença
+      na média de gols; empate 30% - 3 p.p. por gol de diferença
+    """
+
+    name = "heuristica"
+    version = 1
+
+    def calcular(self, home, away):
+        home_goals_avg = np.asarray(home["media_gols"], dtype=np.float64)
+        away_goals_avg = np.asarray(away["media_gols"], dtype=np.float64)
+
+        base_prob = 33.33
+        home_advantage = 10
+        away_advantage = -5
+
+        home_win = base_prob + home_advantage + (home_goals_avg - away_goals_avg) * 8
+        away_win = base_prob + away_advantage + (away_goals_avg - home_goals_avg) * 8
+        draw = 30 - np.abs(home_goals_avg - away_goals_avg) * 3
+
+        return {
+            "over_25": (np.asarray(home["over25"]) + np.asarray(away["over25"])) / 2,
+            "btts_yes": (np.asarray(home["btts"]) + np.asarray(away["btts"])) / 2,
+            "home_win": np.clip(home_win, 15, 75),
+            "draw": np.clip(draw, 20, 35),
+            "away_win": np.clip(away_win, 15, 75),
+        }
+
+
+@registrar
+class PoissonEngine(ProbabilityEngine):
+    """
+    Poisson independente por time: gols esperados do mandante = média entre os
+    gols marcados por ele e os sofridos pelo visitante (e vice-versa). Placar
+    exato até MAX_GOALS gols por time, somado por mercado.
+    Partidas em que algum time não tem amostra ficam com 0%.
+    """
+
+    name = "poisson"
+    version = 1
+
+    MAX_GOALS = 10
+    MIN_LAMBDA = 0.1
+
+    def calcular(self, home, away):
+        lam_home = (np.asarray(home["media_gols"], dtype=np.float64)
+                    + np.asarray(away["media_sofridos"], dtype=np.float64)) / 2
+        lam_away = (np.asarray(away["media_gols"], dtype=np.float64)
+                    + np.asarray(home["media_sofridos"], dtype=np.float64)) / 2
+        lam_home = np.maximum(lam_home, self.MIN_LAMBDA)
+        lam_away = np.maximum(lam_away, self.MIN_LAMBDA)
+
+        k = np.arange(self.MAX_GOALS + 1)
+        log_fact = np.array([math.lgamma(i + 1) for i in k])
+
+        def pmf(lam):
+            # [partidas, gols]
+            return np.exp(k * np.log(lam)[:, None] - lam[:, None] - log_fact)
+
+        p_home = pmf(lam_home)
+        p_away = pmf(lam_away)
+        # Placar exato [partidas, gols mandante, gols visitante]
+        grid = p_home[:, :, None] * p_away[:, None, :]
+
+        gols_home, gols_away = np.meshgrid(k, k, indexing="ij")
+        total = grid.sum(axis=(1, 2))
+
+        def pct(mask):
+            return (grid * mask).sum(axis=(1, 2)) / total * 100
+
+        sem_amostra = (np.asarray(home["sample_size"]) == 0) | (np.asarray(away["sample_size"]) == 0)
+        probs = {
+            "over_25": pct((gols_home + gols_away) >= 3),
+            "btts_yes": pct((gols_home > 0) & (gols_away > 0)),
+            "home_win": pct(gols_home > gols_away),
+            "draw": pct(gols_home == gols_away),
+            "away_win": pct(gols_home < gols_away),
+        }
+        return {market: np.where(sem_amostra, 0.0, values) for market, values in probs.items()}
+
+
+def probabilidades_por_engine(home, away, engine_list=None):
+    """
+    Roda os engines sobre as mesmas taxas (uma passada vetorizada por engine).
+    Retorna { "nome:versão": { mercado: array de % } }.
+    """
+    return {
+        engine.key: engine.calcular(home, away)
+        for engine in (engine_list if engine_list is not None else engines())
+    }
+
+
+def probabilidades_da_partida(probs_by_engine, i):
+    """Probabilidades (arredondadas) da i-ésima partida: { "nome:versão": { mercado: % } }."""
+    return {
+        key: {market: round(float(values[i]), 2) for market, values in probs.items()}
+        for key, probs in probs_by_engine.items()
+    }
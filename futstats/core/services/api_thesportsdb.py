@@ -16,6 +16,8 @@ from core.models import (
     MatchEvent,
     TeamStatistics
 )
+from core.utils import registrar_resultado_team_form, enfileirar_reanalise, enfileirar_proximos_jogos
+from core.form_cache import incrementar_versao
 
 load_dotenv()
 
@@ -230,10 +232,14 @@ async def import_matches_async():
 
     today = now().date()
     seven_days_later = today + timedelta(days=7)
+    resultados_novos = 0
+    times_com_resultado = set()
+    partidas_novas = set()
 
     async with httpx.AsyncClient(timeout=25) as client:
 
         async def import_league_matches(lg):
+            nonlocal resultados_novos
             data = await fetch(client, f"schedule/league/{lg.api_id}/{lg.season}", semaphore)
 
             if not data or "schedule" not in data:
@@ -258,7 +264,7 @@ async def import_matches_async():
 
                 date = make_aware(datetime.strptime(ev["dateEvent"], "%Y-%m-%d"))
 
-                await sync_to_async(Match.objects.update_or_create)(
+                match, created = await sync_to_async(Match.objects.update_or_create)(
                     api_id=ev["idEvent"],
                     defaults={
                         "date": date,
@@ -272,10 +278,29 @@ async def import_matches_async():
                     }
                 )
 
+                # ✅ Resultado novo/corrigido → atualiza a forma dos dois times
+                if match.home_score is not None and match.away_score is not None:
+                    if await sync_to_async(registrar_resultado_team_form)(match):
+                        resultados_novos += 1
+                        times_com_resultado.update((match.home_team_id, match.away_team_id))
+                elif created:
+                    partidas_novas.add(match.id)
+
             print(f"✅ Partidas salvas para {lg.name} (próximos 7 dias)")
 
         await asyncio.gather(*(import_league_matches(lg) for lg in leagues))
 
+    # ✅ Invalida caches de forma (API) apenas se algum resultado mudou
+    if resultados_novos:
+        await sync_to_async(incrementar_versao)()
+        print(f"🔄 {resultados_novos} resultados novos: cache de forma invalidado")
+
+    # ✅ Fila de reanálise: próximos jogos dos times com resultado novo + partidas novas
+    enfileiradas = await sync_to_async(enfileirar_proximos_jogos)(times_com_resultado, "resultado")
+    enfileiradas += await sync_to_async(enfileirar_reanalise)(partidas_novas, "partida")
+    if enfileiradas:
+        print(f"📝 {enfileiradas} partidas na fila de reanálise")
+
 
 
 # =================================
@@ -290,6 +315,7 @@ async def import_match_events_async():
     semaphore = asyncio.Semaphore(10)
     total_processed = 0
     five_days_ago = now() - timedelta(days=5)
+    times_com_eventos = set()
 
     # ✅ Pré-carrega os times para evitar queries dentro do async
     all_matches = await sync_to_async(lambda: list(
@@ -342,6 +368,7 @@ async def import_match_events_async():
                     # ✅ Marca como importado APENAS AQUI
                     match.events_fetched_at = now()
                     await sync_to_async(match.save)()
+                    times_com_eventos.update((match.home_team_id, match.away_team_id))
 
                     print(
                         f"✅ Eventos importados para {match.api_id} "
@@ -360,6 +387,11 @@ async def import_match_events_async():
             print(f"⏭️ Processados {total_processed}/{total_to_process} jogos até agora...\n")
             await asyncio.sleep(20)
 
+    # ✅ Cartões entram nos insights: invalida caches de forma
+    if total_processed:
+        await sync_to_async(incrementar_versao)()
+        await sync_to_async(enfileirar_proximos_jogos)(times_com_eventos, "eventos")
+
     print("🏁 Fim da importação de eventos.\n")
 
 
@@ -386,6 +418,7 @@ async def import_match_stats_async():
         return
 
     semaphore = asyncio.Semaphore(5)  # ✅ menor concorrência = estável
+    times_com_stats = set()
 
     async with httpx.AsyncClient(timeout=20) as client:
 
@@ -443,6 +476,7 @@ async def import_match_stats_async():
 
                 match.stats_fetched_at = now()
                 await sync_to_async(match.save)()
+                times_com_stats.update((match.home_team_id, match.away_team_id))
 
                 print(f"✅ Estatísticas importadas para {match.api_id}")
 
@@ -452,3 +486,8 @@ async def import_match_stats_async():
         # ✅ rodar tudo com gather
         tasks = [import_stats(m) for m in matches]
         await asyncio.gather(*tasks)
+
+    # ✅ Escanteios entram nos insights: invalida caches de forma
+    if times_com_stats:
+        await sync_to_async(incrementar_versao)()
+        await sync_to_async(enfileirar_proximos_jogos)(times_com_stats, "estatisticas")
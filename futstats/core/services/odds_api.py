@@ -2,12 +2,14 @@
 
 import os
 import httpx
-from decimal import Decimal
 from dotenv import load_dotenv
 from asgiref.sync import sync_to_async
 from django.utils.timezone import now, make_aware
 from datetime import datetime
-from core.models import Match, MatchOdds, Bookmaker, League
+from django.db import transaction
+from core.models import Match, MatchOdds, OddsQuote, OddsHistory, Bookmaker, League
+from core.markets import API_MARKETS, ODD_FIELDS, parse_cotacoes
+from core.utils import atualizar_best_odds, enfileirar_reanalise, preco_int, ultimos_precos
 
 load_dotenv()
 
@@ -219,6 +221,21 @@ def normalize_team_name(team_name):
     return aliases.get(s, s)
 
 
+def salvar_cotacoes(match, bookmaker_ids, quotes, history=()):
+    """
+    Substitui as cotações (OddsQuote) da partida para os bookmakers do evento
+    por `quotes`, em uma transação e um único bulk insert, e atualiza as BestOdds
+    da partida na mesma transação. `history`: linhas novas de OddsHistory
+    (só os preços que mudaram).
+    """
+    with transaction.atomic():
+        OddsQuote.objects.filter(match=match, bookmaker_id__in=bookmaker_ids).delete()
+        OddsQuote.objects.bulk_create(quotes, batch_size=1000)
+        if history:
+            OddsHistory.objects.bulk_create(history, batch_size=1000)
+        atualizar_best_odds([match.id])
+
+
 def find_matching_match(odds_event, matches):
     """
     Tenta encontrar um Match no banco que corresponda ao evento da API de odds
@@ -355,8 +372,15 @@ async def process_and_save_odds(odds_data, league=None, days_ahead=1):
         print(f"   - {match.home_team.name} x {match.away_team.name} ({match.date.strftime('%d/%m %H:%M')})")
     
     saved_count = 0
+    quotes_count = 0
     matched_count = 0
     unmatched_events = []
+    touched_match_ids = set()
+    history_count = 0
+
+    # Último preço visto de cada (partida, bookmaker, mercado), em 1 consulta:
+    # o histórico só recebe linhas quando o preço muda.
+    last_seen = await sync_to_async(ultimos_precos)([m.id for m in matches])
     
     for event in odds_data:
         # Tentar encontrar match correspondente
@@ -373,6 +397,9 @@ async def process_and_save_odds(odds_data, league=None, days_ahead=1):
         matched_count += 1
         
         event_id = event.get("id")
+        event_quotes = []
+        event_history = []
+        event_bookmaker_ids = set()
         
         # Processar cada bookmaker
         for bookmaker_data in event.get("bookmakers", []):
@@ -394,94 +421,77 @@ async def process_and_save_odds(odds_data, league=None, days_ahead=1):
                 bookmaker.is_brazilian = is_brazilian
                 await sync_to_async(bookmaker.save)()
             
-            # Processar markets
-            home_win = None
-            draw = None
-            away_win = None
-            over_25 = None
-            under_25 = None
-            btts_yes = None
-            btts_no = None
-            
-            for market in bookmaker_data.get("markets", []):
-                market_key = market.get("key")
-                outcomes = market.get("outcomes", [])
-                
-                if market_key == "h2h":
-                    # Head to head (1X2)
-                    for outcome in outcomes:
-                        name = outcome.get("name", "").lower()
-                        price = outcome.get("price")
-                        
-                        if not price:
-                            continue
-                        
-                        # Tentar identificar qual time é qual
-                        if match.home_team.name.lower() in name or name in match.home_team.name.lower():
-                            home_win = Decimal(str(price))
-                        elif match.away_team.name.lower() in name or name in match.away_team.name.lower():
-                            away_win = Decimal(str(price))
-                        elif "draw" in name or "empate" in name or "tie" in name:
-                            draw = Decimal(str(price))
-                
-                elif market_key == "totals":
-                    # Over/Under
-                    for outcome in outcomes:
-                        name = outcome.get("name", "").lower()
-                        point = outcome.get("point")
-                        price = outcome.get("price")
-                        
-                        if not price or not point:
-                            continue
-                        
-                        # Verificar se é Over/Under 2.5
-                        if abs(float(point) - 2.5) < 0.1:
-                            if "over" in name:
-                                over_25 = Decimal(str(price))
-                            elif "under" in name:
-                                under_25 = Decimal(str(price))
-                
-                elif market_key == "btts":
-                    # Both Teams To Score
-                    for outcome in outcomes:
-                        name = outcome.get("name", "").lower()
-                        price = outcome.get("price")
-                        
-                        if not price:
-                            continue
-                        
-                        if "yes" in name or "sim" in name:
-                            btts_yes = Decimal(str(price))
-                        elif "no" in name or "não" in name:
-                            btts_no = Decimal(str(price))
+            # Processar markets (todas as linhas suportadas pelo registro de mercados)
+            quotes = parse_cotacoes(bookmaker_data, match.home_team.name, match.away_team.name)
+            fetched_at = now()
+            event_quotes.extend(
+                OddsQuote(
+                    match=match,
+                    bookmaker=bookmaker,
+                    market=market.api_market,
+                    line=market.line,
+                    outcome=market.outcome,
+                    price=price,
+                    fetched_at=fetched_at,
+                )
+                for market, price in quotes
+            )
+            event_bookmaker_ids.add(bookmaker.id)
+
+            for market, price in quotes:
+                key = (match.id, bookmaker.id, market.key)
+                price_int = preco_int(price)
+                if last_seen.get(key) != price_int:
+                    last_seen[key] = price_int
+                    event_history.append(OddsHistory(
+                        match=match,
+                        bookmaker=bookmaker,
+                        market=market.key,
+                        price=price_int,
+                        fetched_at=fetched_at,
+                    ))
+
+            # Colunas fixas de MatchOdds (mercados com coluna legada)
+            legacy = {field: None for _, field in ODD_FIELDS}
+            for market, price in quotes:
+                if market.odd_field:
+                    legacy[market.odd_field] = price
             
             # Salvar odds apenas se tiver pelo menos uma odd válida
-            if any([home_win, draw, away_win, over_25, under_25, btts_yes, btts_no]):
+            if any(legacy.values()):
                 match_odds, created = await sync_to_async(MatchOdds.objects.update_or_create)(
                     match=match,
                     bookmaker=bookmaker,
                     defaults={
-                        "home_win_odd": home_win,
-                        "draw_odd": draw,
-                        "away_win_odd": away_win,
-                        "over_25_odd": over_25,
-                        "under_25_odd": under_25,
-                        "btts_yes_odd": btts_yes,
-                        "btts_no_odd": btts_no,
+                        **legacy,
                         "odds_api_event_id": event_id,
-                        "last_api_fetch": now(),  # Marcar quando foi buscado da API
-                        "last_updated": now(),  # Usar a função now() importada do topo
+                        "last_api_fetch": fetched_at,  # Marcar quando foi buscado da API
+                        "last_updated": fetched_at,
                     }
                 )
                 
+                touched_match_ids.add(match.id)
                 if created:
                     saved_count += 1
                     print(f"Odds salvas: {match} - {bookmaker.name}")
+
+        # Cotações do evento (todas as linhas) em um único bulk insert
+        if event_bookmaker_ids:
+            await sync_to_async(salvar_cotacoes)(match, event_bookmaker_ids, event_quotes, event_history)
+            quotes_count += len(event_quotes)
+            history_count += len(event_history)
+            if event_quotes:
+                touched_match_ids.add(match.id)
+    
+    # Partidas com odds novas/atualizadas vão para a fila de reanálise (best_by_market)
+    await sync_to_async(enfileirar_reanalise)(touched_match_ids, "odds")
     
     print("\nResumo:")
     print(f"   Eventos da API: {len(odds_data)}")
     print(f"   Matches encontrados: {matched_count}")
     print(f"   Odds salvas: {saved_count}")
+    print(f"   Cotações gravadas: {quotes_count}")
+    print(f"   Mudanças de preço no histórico: {history_count}")
     print(f"   Eventos sem match: {len(unmatched_events)}")
     
     # Mostrar alguns exemplos de eventos não encontrados
@@ -500,8 +510,8 @@ async def import_odds_for_league(league, days_ahead=1):
         sport_key = get_sport_key_for_league(league.name)
         print(f"\nBuscando odds para {league.name} (sport_key: {sport_key})")
         
-        # Buscar apenas h2h e totals (btts não disponível no plano gratuito)
-        odds_data = await fetch_odds_for_sport(sport_key, markets="h2h,totals")
+        # Mercados do registro (btts não disponível no plano gratuito)
+        odds_data = await fetch_odds_for_sport(sport_key, markets=API_MARKETS)
         
         if odds_data:
             await process_and_save_odds(odds_data, league, days_ahead)
@@ -0,0 +1,482 @@
+# FutStats/core/stats_engine.py
+
+import numpy as np
+
+# Profundidade máxima da forma guardada por time (TeamForm/snapshot); qualquer
+# amostra de 1 a FORM_WINDOW jogos é respondida a partir dela.
+FORM_WINDOW = 20
+
+
+def smoothed_percent_array(hits, n, alpha=1, beta=1, max_pct=95):
+    """
+    Versão vetorizada de `utils._smoothed_percent` (mesma fórmula e arredondamento).
+    p = (hits + alpha) / (n + alpha + beta), teto 85% quando n < 5, 0 quando n == 0.
+    """
+    hits = np.asarray(hits, dtype=np.int64)
+    n = np.asarray(n, dtype=np.int64)
+
+    p = (hits + alpha) / (n + alpha + beta)
+    # np.rint arredonda "half to even", igual ao round() do Python.
+    pct = np.rint(p * 100).astype(np.int64)
+
+    effective_max = np.where(n >= 5, max_pct, min(max_pct, 85))
+    pct = np.minimum(effective_max, np.maximum(0, pct))
+
+    return np.where(n > 0, pct, 0)
+
+
+class FormEngine:
+    """
+    Forma recente dos times em arrays NumPy (layout colunar, 1 linha por time).
+
+    - team_ids: ids dos times (ordenados); `index_of` / `indices` traduzem id -> linha
+    - goals_for / goals_against / dates / match_ids: matriz [times, limit], do jogo
+      mais recente para o mais antigo (posições além de `sample_size` são padding)
+
+    As taxas (over25, btts, media_gols, sample_size) são calculadas uma única vez,
+    para todos os times, e ficam em arrays indexados pela linha do time. A última
+    linha é um "time vazio" (amostra 0) usado para ids desconhecidos.
+
+    Cartões e escanteios (media_cartoes, media_escanteios) são opcionais: ficam
+    None até `carregar_cartoes_escanteios()` ser chamado.
+
+    Também guarda somas de prefixo por time ([times + 1, limit + 1]: coluna k =
+    soma dos k jogos mais recentes), então `taxas(idx, n)` responde qualquer
+    amostra n <= limit em O(1) por time, sem recarregar nada.
+    """
+
+    def __init__(self, team_ids, goals_for, goals_against, dates, match_ids, sample_size, limit):
+        self.limit = int(limit)
+        self.team_ids = np.asarray(team_ids, dtype=np.int64)
+        self.goals_for = np.asarray(goals_for, dtype=np.int16)
+        self.goals_against = np.asarray(goals_against, dtype=np.int16)
+        self.dates = np.asarray(dates, dtype=np.int64)
+        self.match_ids = np.asarray(match_ids, dtype=np.int64)
+
+        # Linha extra (amostra 0) para times sem jogos.
+        self.sample_size = np.append(np.asarray(sample_size, dtype=np.int64), 0)
+        self.missing = len(self.team_ids)
+
+        self._index = {tid: i for i, tid in enumerate(self.team_ids.tolist())}
+
+        self.cards = None
+        self.corners = None
+        self.media_cartoes = None
+        self.media_escanteios = None
+
+        self._calcular()
+
+    # --------------------------------------------------------
+    # Construtores
+    # --------------------------------------------------------
+    @classmethod
+    def from_rows(cls, team, match_id, date, goals_for, goals_against, limit):
+        """
+        Monta o engine a partir de arrays "longos" (1 linha por time/partida).
+        Ordena por time e data (desc) e mantém os `limit` jogos mais recentes de cada time.
+        """
+        team = np.asarray(team, dtype=np.int64)
+        match_id = np.asarray(match_id, dtype=np.int64)
+        date = np.asarray(date, dtype=np.int64)
+        goals_for = np.asarray(goals_for, dtype=np.int16)
+        goals_against = np.asarray(goals_against, dtype=np.int16)
+
+        if not len(team):
+            empty = np.zeros((0, limit), dtype=np.int64)
+            return cls([], empty, empty, empty, empty, [], limit)
+
+        # lexsort: última chave é a principal -> time asc, data desc, id desc
+        order = np.lexsort((-match_id, -date, team))
+        team, match_id, date = team[order], match_id[order], date[order]
+        goals_for, goals_against = goals_for[order], goals_against[order]
+
+        starts = np.flatnonzero(np.r_[True, team[1:] != team[:-1]])
+        counts = np.diff(np.r_[starts, len(team)])
+        rank = np.arange(len(team)) - np.repeat(starts, counts)
+        row = np.repeat(np.arange(len(starts)), counts)
+
+        keep = rank < limit
+        row, rank = row[keep], rank[keep]
+
+        shape = (len(starts), limit)
+        gf = np.zeros(shape, dtype=np.int16)
+        ga = np.zeros(shape, dtype=np.int16)
+        dt = np.zeros(shape, dtype=np.int64)
+        mid = np.zeros(shape, dtype=np.int64)
+        gf[row, rank] = goals_for[keep]
+        ga[row, rank] = goals_against[keep]
+        dt[row, rank] = date[keep]
+        mid[row, rank] = match_id[keep]
+
+        return cls(team[starts], gf, ga, dt, mid, np.minimum(counts, limit), limit)
+
+    @classmethod
+    def from_cache(cls, cache, limit):
+        """Monta o engine a partir de um cache { team_id: [jogos] } (preload/TeamForm)."""
+        rows = [
+            (
+                team_id,
+                m.id,
+                int(m.date.timestamp()),
+                m.home_score if m.home_team_id == team_id else m.away_score,
+                m.away_score if m.home_team_id == team_id else m.home_score,
+            )
+            for team_id, jogos in cache.items()
+            for m in jogos
+            if m.home_score is not None and m.away_score is not None
+        ]
+        cols = list(zip(*rows)) if rows else [[], [], [], [], []]
+        return cls.from_rows(*cols, limit=limit)
+
+    @classmethod
+    def carregar(cls, limit=5, team_ids=None):
+        """
+        Carrega a forma recente dos times (TeamForm, com fallback para SQL) uma única
+        vez e converte para arrays.
+        """
+        from .utils import carregar_forma_times
+
+        return cls.from_cache(carregar_forma_times(limit=limit, team_ids=team_ids), limit)
+
+    # --------------------------------------------------------
+    # Métricas (todas vetorizadas, para todos os times de uma vez)
+    # --------------------------------------------------------
+    def _prefixo(self, values):
+        """Somas acumuladas por time ([times + 1, limit + 1]), com a linha vazia zerada."""
+        pref = np.zeros((len(values) + 1, self.limit + 1), dtype=np.int64)
+        np.cumsum(values, axis=1, out=pref[:-1, 1:])
+        return pref
+
+    def _calcular(self):
+        valid = self._janela()
+
+        gf = self.goals_for.astype(np.int64)
+        ga = self.goals_against.astype(np.int64)
+
+        self._pref_over = self._prefixo(((gf + ga) >= 3) & valid)
+        self._pref_btts = self._prefixo((gf > 0) & (ga > 0) & valid)
+        self._pref_gols = self._prefixo(np.where(valid, gf, 0))
+        self._pref_sofridos = self._prefixo(np.where(valid, ga, 0))
+
+        rates = self.taxas(np.arange(len(self.sample_size)), self.limit)
+        self.over25 = rates["over25"]
+        self.btts = rates["btts"]
+        self.media_gols = rates["media_gols"]
+
+    def _janela(self):
+        # Máscara [times, limit] dos jogos que fazem parte da amostra de cada time.
+        return np.arange(self.limit) < self.sample_size[:-1, None]
+
+    def carregar_cartoes_escanteios(self):
+        """
+        Carrega cartões e escanteios dos jogos da amostra de TODOS os times com
+        duas consultas agrupadas (MatchEvent e TeamStatistics), em vez de
+        consultas por time. Usa a mesma janela (últimos `limit` jogos) dos gols.
+        """
+        from django.db.models import Count
+        from .models import MatchEvent, TeamStatistics
+
+        valid = self._janela()
+        rows, cols = np.nonzero(valid)
+        team_ids = self.team_ids[rows].tolist()
+        match_ids = self.match_ids[rows, cols].tolist()
+
+        cards_by_pair = {}
+        corners_by_pair = {}
+        if match_ids:
+            cards_by_pair = {
+                (tid, mid): n
+                for tid, mid, n in (
+                    MatchEvent.objects
+                    .filter(type="Card", team_id__in=set(team_ids), match_id__in=set(match_ids))
+                    .values("team_id", "match_id")
+                    .annotate(n=Count("id"))
+                    .values_list("team_id", "match_id", "n")
+                )
+            }
+            corners_by_pair = {
+                (tid, mid): corners or 0
+                for tid, mid, corners in (
+                    TeamStatistics.objects
+                    .filter(team_id__in=set(team_ids), match_id__in=set(match_ids))
+                    .values_list("team_id", "match_id", "corner_kicks")
+                )
+            }
+
+        # corners = -1 quando a partida não tem estatísticas para o time
+        self.cards = np.zeros(valid.shape, dtype=np.int16)
+        self.corners = np.full(valid.shape, -1, dtype=np.int16)
+        pairs = list(zip(team_ids, match_ids))
+        self.cards[rows, cols] = [cards_by_pair.get(p, 0) for p in pairs]
+        self.corners[rows, cols] = [corners_by_pair.get(p, -1) for p in pairs]
+
+        self._calcular_cartoes_escanteios()
+        return self
+
+    def _calcular_cartoes_escanteios(self):
+        valid = self._janela()
+        has_stats = valid & (self.corners >= 0)
+
+        self._pref_cards = self._prefixo(np.where(valid, self.cards, 0))
+        self._pref_corners = self._prefixo(np.where(has_stats, self.corners, 0))
+        self._pref_stats = self._prefixo(has_stats)
+
+        rates = self.taxas(np.arange(len(self.sample_size)), self.limit)
+        self.media_cartoes = rates["media_cartoes"]
+        self.media_escanteios = rates["media_escanteios"]
+
+    # --------------------------------------------------------
+    # Qualquer tamanho de amostra (somas de prefixo)
+    # --------------------------------------------------------
+    def taxas(self, idx, n):
+        """
+        Taxas das linhas `idx` considerando só os `n` jogos mais recentes de cada
+        time (1 <= n <= limit). Mesmas fórmulas e arredondamentos das taxas do engine.
+
+        Retorna dict de arrays: sample_size, over25, btts, media_gols,
+        media_sofridos e, se carregados, media_cartoes e media_escanteios.
+        """
+        if not 1 <= n <= self.limit:
+            raise ValueError(f"Amostra deve estar entre 1 e {self.limit} jogos.")
+
+        idx = np.asarray(idx, dtype=np.int64)
+        k = np.minimum(self.sample_size[idx], n)
+
+        def media(pref, count, digits):
+            # round() do Python por time (np.round difere em alguns empates de ponto flutuante)
+            return np.array(
+                [round(s / c, digits) if c else 0 for s, c in zip(pref[idx, k].tolist(), count.tolist())],
+                dtype=np.float64,
+            )
+
+        rates = {
+            "sample_size": k,
+            "over25": smoothed_percent_array(self._pref_over[idx, k], k),
+            "btts": smoothed_percent_array(self._pref_btts[idx, k], k),
+            "media_gols": media(self._pref_gols, k, 2),
+            "media_sofridos": media(self._pref_sofridos, k, 2),
+        }
+        if self.cards is not None:
+            rates["media_cartoes"] = media(self._pref_cards, k, 1)
+            rates["media_escanteios"] = media(self._pref_corners, self._pref_stats[idx, k], 1)
+        return rates
+
+    def recortar(self, n):
+        """
+        Engine com apenas os `n` jogos mais recentes de cada time (views das
+        matrizes, sem consultar o banco). Usado para servir amostras menores a
+        partir do engine de profundidade FORM_WINDOW.
+        """
+        if n == self.limit:
+            return self
+        if not 1 <= n <= self.limit:
+            raise ValueError(f"Amostra deve estar entre 1 e {self.limit} jogos.")
+
+        engine = FormEngine(
+            self.team_ids,
+            self.goals_for[:, :n],
+            self.goals_against[:, :n],
+            self.dates[:, :n],
+            self.match_ids[:, :n],
+            np.minimum(self.sample_size[:-1], n),
+            n,
+        )
+        if self.cards is not None:
+            engine.cards = self.cards[:, :n]
+            engine.corners = self.corners[:, :n]
+            engine._calcular_cartoes_escanteios()
+        return engine
+
+    def subconjunto(self, team_ids):
+        """
+        Engine só com os times informados (cópia compacta das linhas), ex.: para
+        enviar a forma de uma liga a um processo worker.
+        """
+        rows = sorted({self._index[tid] for tid in team_ids if tid in self._index})
+        return self.linhas(rows)
+
+    def linhas(self, rows):
+        """
+        Engine só com as linhas `rows`, na ordem informada (cópia compacta). Ex.:
+        separar as linhas de um engine de `FormHistory.forma_em` por grupo de partidas.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        engine = FormEngine(
+            self.team_ids[rows],
+            self.goals_for[rows],
+            self.goals_against[rows],
+            self.dates[rows],
+            self.match_ids[rows],
+            self.sample_size[rows],
+            self.limit,
+        )
+        if self.cards is not None:
+            engine.cards = self.cards[rows]
+            engine.corners = self.corners[rows]
+            engine._calcular_cartoes_escanteios()
+        return engine
+
+    # --------------------------------------------------------
+    # Acesso por time
+    # --------------------------------------------------------
+    def index_of(self, team_id):
+        return self._index.get(team_id, self.missing)
+
+    def indices(self, team_ids):
+        """Linhas dos times (ids desconhecidos apontam para a linha vazia)."""
+        return np.fromiter(
+            (self._index.get(tid, self.missing) for tid in team_ids),
+            dtype=np.int64,
+        )
+
+    def over25_de(self, team_id):
+        return int(self.over25[self.index_of(team_id)])
+
+    def btts_de(self, team_id):
+        return int(self.btts[self.index_of(team_id)])
+
+    def media_gols_de(self, team_id):
+        return float(self.media_gols[self.index_of(team_id)])
+
+    def amostra_de(self, team_id):
+        return int(self.sample_size[self.index_of(team_id)])
+
+    def match_ids_de(self, team_id):
+        i = self.index_of(team_id)
+        if i == self.missing:
+            return []
+        return self.match_ids[i, : self.sample_size[i]].tolist()
+
+    def cartoes_escanteios_de(self, team_id):
+        """(cartões, escanteios) por jogo da amostra; escanteios -1 sem estatísticas."""
+        i = self.index_of(team_id)
+        if i == self.missing or self.cards is None:
+            return [], []
+        n = self.sample_size[i]
+        return self.cards[i, :n].tolist(), self.corners[i, :n].tolist()
+
+    def media_cartoes_de(self, team_id):
+        return float(self.media_cartoes[self.index_of(team_id)])
+
+    def media_escanteios_de(self, team_id):
+        return float(self.media_escanteios[self.index_of(team_id)])
+
+
+class FormHistory:
+    """
+    Histórico COMPLETO de jogos finalizados por time, para consultas "as of":
+    a forma de um time considerando apenas jogos estritamente anteriores a um
+    instante T (sem vazar resultados futuros em análises históricas/backtests).
+
+    Layout: arrays "longos" (1 linha por time/partida) ordenados por time e data
+    crescente. `_keys` combina a linha do time e a data (time << 33 | epoch), então
+    um único np.searchsorted localiza, para vários pares (time, T) de uma vez, onde
+    terminam os jogos anteriores a T.
+    """
+
+    # Epoch em segundos cabe em 33 bits até o ano 2242.
+    _DATE_BITS = 33
+
+    def __init__(self, team, match_id, date, goals_for, goals_against):
+        team = np.asarray(team, dtype=np.int64)
+        match_id = np.asarray(match_id, dtype=np.int64)
+        date = np.asarray(date, dtype=np.int64)
+
+        # lexsort: última chave é a principal -> time asc, data asc, id asc
+        order = np.lexsort((match_id, date, team))
+        self.team = team[order]
+        self.match_id = match_id[order]
+        self.date = date[order]
+        self.goals_for = np.asarray(goals_for, dtype=np.int16)[order]
+        self.goals_against = np.asarray(goals_against, dtype=np.int16)[order]
+
+        self.team_ids, self._starts = np.unique(self.team, return_index=True)
+        self._index = {tid: i for i, tid in enumerate(self.team_ids.tolist())}
+
+        rows = np.repeat(np.arange(len(self.team_ids)), np.diff(np.r_[self._starts, len(self.team)]))
+        self._keys = (rows << self._DATE_BITS) | self.date
+
+    @classmethod
+    def carregar(cls, team_ids=None):
+        """
+        Carrega (uma consulta) todos os jogos finalizados dos times, nas duas
+        perspectivas (mandante e visitante).
+        """
+        from django.db.models import Q
+        from .models import Match
+
+        qs = Match.objects.filter(home_score__isnull=False, away_score__isnull=False)
+        if team_ids is not None:
+            team_ids = {tid for tid in team_ids if tid is not None}
+            qs = qs.filter(Q(home_team_id__in=team_ids) | Q(away_team_id__in=team_ids))
+
+        team, match_id, date, goals_for, goals_against = [], [], [], [], []
+        for mid, dt, home_id, away_id, home_score, away_score in qs.values_list(
+            "id", "date", "home_team_id", "away_team_id", "home_score", "away_score"
+        ):
+            ts = int(dt.timestamp())
+            team += [home_id, away_id]
+            match_id += [mid, mid]
+            date += [ts, ts]
+            goals_for += [home_score, away_score]
+            goals_against += [away_score, home_score]
+
+        return cls(team, match_id, date, goals_for, goals_against)
+
+    def forma_em(self, team_ids, timestamps, limit=5):
+        """
+        Forma de cada par (time, T): últimos `limit` jogos finalizados do time
+        estritamente antes de T (datetime ou epoch em segundos).
+
+        Retorna um FormEngine com UMA LINHA POR CONSULTA, na ordem recebida
+        (um time pode aparecer várias vezes, com instantes diferentes): acesse
+        as taxas por posição (`engine.over25[i]`), não por `*_de(team_id)`.
+        """
+        team_ids = list(team_ids)
+        ts = np.fromiter(
+            (t if isinstance(t, (int, np.integer)) else int(t.timestamp()) for t in timestamps),
+            dtype=np.int64,
+        )
+        rows = np.fromiter((self._index.get(tid, -1) for tid in team_ids), dtype=np.int64, count=len(ts))
+        known = rows >= 0
+
+        # Fim (exclusivo) dos jogos anteriores a T e início da janela de `limit` jogos.
+        end = np.zeros(len(ts), dtype=np.int64)
+        start = np.zeros(len(ts), dtype=np.int64)
+        if known.any():
+            end[known] = np.searchsorted(self._keys, (rows[known] << self._DATE_BITS) | ts[known], side="left")
+            start[known] = np.maximum(self._starts[rows[known]], end[known] - limit)
+        counts = end - start
+
+        # Posição k da janela = k-ésimo jogo mais recente -> índice end - 1 - k no histórico.
+        k = np.arange(limit)
+        valid = k < counts[:, None]
+        idx = np.where(valid, end[:, None] - 1 - k, 0)
+
+        shape = (len(ts), limit)
+        if len(self.team):
+            gf = np.where(valid, self.goals_for[idx], 0)
+            ga = np.where(valid, self.goals_against[idx], 0)
+            dt = np.where(valid, self.date[idx], 0)
+            mid = np.where(valid, self.match_id[idx], 0)
+        else:
+            gf = ga = dt = mid = np.zeros(shape, dtype=np.int64)
+
+        query_ids = np.fromiter((tid if tid is not None else -1 for tid in team_ids), dtype=np.int64, count=len(ts))
+        return FormEngine(query_ids, gf, ga, dt, mid, counts, limit)
+
+    def forma_das_partidas(self, matches, limit=5):
+        """
+        Forma dos dois times de cada partida no momento do pontapé inicial
+        (para reconstruir análises históricas em uma única passada).
+
+        Retorna (engine, home_idx, away_idx): linhas do engine para mandante e visitante.
+        """
+        matches = list(matches)
+        n = len(matches)
+        engine = self.forma_em(
+            [m.home_team_id for m in matches] + [m.away_team_id for m in matches],
+            [m.date for m in matches] * 2,
+            limit=limit,
+        )
+        return engine, np.arange(n), np.arange(n, 2 * n)
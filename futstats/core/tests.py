@@ -1,3 +1,528 @@
-from django.test import TestCase
+import contextlib
+import io
+import os
+import random
+import stat
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.db.models import F, Q
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .analises import salvar_analises
+from .arbitragem import escanear_arbitragem
+from .betting_utils import get_best_value_bets, sincronizar_recomendacoes
+from .clv import avaliar_clv
+from .form_cache import form_cache
+from .form_snapshot import escrever_snapshot
+from .models import (
+    BestOdds, BetRecommendation, Bookmaker, CLVSummary, League, Match, MatchAnalysis, MatchEvent, MatchOdds,
+    OddsHistory, OddsQuote, Team, TeamStatistics,
+)
+from .prob_engines import get_engine
+from .services import odds_api
+from .stats_engine import FORM_WINDOW, FormEngine, FormHistory, smoothed_percent_array
+from .utils import (
+    atualizar_best_odds, calcular_btts, calcular_media_cartoes, calcular_media_escanteios, calcular_media_gols,
+    calcular_over25, gerar_insights_rapidos, preload_ultimos_jogos, reconstruir_team_form,
+)
+
+
+class PartidasMixin:
+    """
+    Base dos testes: duas ligas, 12 times, partidas finalizadas a cada 3 dias (com
+    cartões e escanteios aleatórios, mas determinísticos) e partidas futuras.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        rnd = random.Random(7)
+        cls.now = timezone.now().replace(microsecond=0)
+        cls.leagues = [
+            League.objects.create(api_id=i, name=f"Liga {i}", country="Brasil", season="2025")
+            for i in (1, 2)
+        ]
+        cls.teams = [
+            Team.objects.create(api_id=100 + i, name=f"Time {i}", league=cls.leagues[i % 2])
+            for i in range(12)
+        ]
+
+        api_id = 1000
+        for day in range(3, 90, 3):
+            teams = cls.teams[:]
+            rnd.shuffle(teams)
+            for home, away in zip(teams[::2], teams[1::2]):
+                api_id += 1
+                match = Match.objects.create(
+                    api_id=api_id,
+                    date=cls.now - timedelta(days=day),
+                    league=home.league,
+                    home_team=home,
+                    away_team=away,
+                    home_score=rnd.randint(0, 4),
+                    away_score=rnd.randint(0, 3),
+                )
+                for team in (home, away):
+                    for _ in range(rnd.randint(0, 3)):
+                        MatchEvent.objects.create(match=match, team=team, type="Card", minute=10)
+                    if rnd.random() < 0.8:
+                        TeamStatistics.objects.create(match=match, team=team, corner_kicks=rnd.randint(0, 10))
+
+        cls.future = []
+        for day in range(2):
+            for home, away in zip(cls.teams[::2], cls.teams[1::2]):
+                api_id += 1
+                cls.future.append(Match.objects.create(
+                    api_id=api_id,
+                    date=cls.now + timedelta(days=day, hours=1),
+                    league=home.league,
+                    home_team=home,
+                    away_team=away,
+                ))
+
+        cls.bookmakers = [Bookmaker.objects.create(name=f"Casa {i}", api_key=f"casa{i}") for i in range(3)]
+
+    def partidas(self, qs):
+        return list(qs.select_related("home_team", "away_team", "league").order_by("date", "id"))
+
+
+class FormHistoryTests(PartidasMixin, TestCase):
+    def test_forma_em_bate_com_jogos_estritamente_anteriores(self):
+        history = FormHistory.carregar()
+        queries = [
+            (team.id, self.now - timedelta(days=days))
+            for team in self.teams
+            for days in (0, 3, 31, 60, 87, 100)
+        ]
+        engine = history.forma_em([q[0] for q in queries], [q[1] for q in queries], limit=5)
+
+        for row, (team_id, when) in enumerate(queries):
+            esperado = list(
+                Match.objects.filter(
+                    Q(home_team_id=team_id) | Q(away_team_id=team_id),
+                    home_score__isnull=False,
+                    date__lt=when,
+                )
+                .order_by("-date", "-id")
+                .values_list("id", flat=True)[:5]
+            )
+            n = engine.sample_size[row]
+            self.assertEqual(engine.match_ids[row, :n].tolist(), esperado)
+
+    def test_modo_historico_igual_ao_atual_para_partidas_futuras(self):
+        reconstruir_team_form()
+        matches = self.partidas(Match.objects.filter(home_score__isnull=True))
+
+        salvar_analises(matches, force=True)
+        atual = {a.match_id: (a.input_fingerprint, a.insights, a.team_rates) for a in MatchAnalysis.objects.all()}
+
+        salvar_analises(matches, force=True, historico=True)
+        historico = {a.match_id: (a.input_fingerprint, a.insights, a.team_rates) for a in MatchAnalysis.objects.all()}
+
+        self.assertEqual(historico, atual)
+
+    def test_modo_historico_nao_usa_jogos_posteriores(self):
+        matches = self.partidas(Match.objects.filter(home_score__isnull=False))
+        salvar_analises(matches, historico=True)
+
+        for match in matches:
+            rates = MatchAnalysis.objects.get(match=match).team_rates
+            for side, team_id in (("home", match.home_team_id), ("away", match.away_team_id)):
+                anteriores = list(
+                    Match.objects.filter(
+                        Q(home_team_id=team_id) | Q(away_team_id=team_id),
+                        home_score__isnull=False,
+                        date__lt=match.date,
+                    ).order_by("-date", "-id")[:5]
+                )
+                over = sum(m.home_score + m.away_score >= 3 for m in anteriores)
+                self.assertEqual(rates[side]["sample_size"], len(anteriores))
+                self.assertEqual(rates[side]["over_25"], int(smoothed_percent_array(over, len(anteriores))))
+
+
+class FormEngineTests(PartidasMixin, TestCase):
+    def test_preload_em_uma_consulta(self):
+        with self.assertNumQueries(1):
+            cache = preload_ultimos_jogos(limit=5)
+
+        for team in self.teams:
+            esperado = list(
+                Match.objects.filter(Q(home_team=team) | Q(away_team=team), home_score__isnull=False)
+                .order_by("-date", "-id")
+                .values_list("id", "date", "home_score", "away_score")[:5]
+            )
+            obtido = [(m.id, m.date, m.home_score, m.away_score) for m in cache.get(team.id, [])]
+            self.assertEqual(obtido, esperado, team.id)
+
+    def test_paridade_com_funcoes_calcular(self):
+        cache = preload_ultimos_jogos(limit=5)
+        engine = FormEngine.from_cache(cache, 5)
+
+        for team in self.teams:
+            for funcao in (calcular_over25, calcular_btts, calcular_media_gols):
+                self.assertEqual(funcao(team, engine), funcao(team, cache), (funcao.__name__, team.id))
+
+    def test_cartoes_e_escanteios_em_lote(self):
+        cache = preload_ultimos_jogos(limit=5)
+        engine = FormEngine.from_cache(cache, 5).carregar_cartoes_escanteios()
+
+        with self.assertNumQueries(0):
+            lote = {
+                team.id: (calcular_media_cartoes(team, engine), calcular_media_escanteios(team, engine))
+                for team in self.teams
+            }
+        for team in self.teams:
+            # Sem o engine: uma consulta por time
+            self.assertEqual(lote[team.id], (calcular_media_cartoes(team, cache), calcular_media_escanteios(team, cache)))
+
+    def test_taxas_com_qualquer_amostra(self):
+        team_ids = [team.id for team in self.teams] + [-1]
+        engine = FormEngine.carregar(limit=FORM_WINDOW).carregar_cartoes_escanteios()
+
+        for n in range(1, FORM_WINDOW + 1):
+            rates = engine.taxas(engine.indices(team_ids), n)
+            esperado = FormEngine.from_cache(preload_ultimos_jogos(limit=n), n).carregar_cartoes_escanteios()
+            idx = esperado.indices(team_ids)
+            self.assertEqual(rates["sample_size"].tolist(), esperado.sample_size[idx].tolist())
+            self.assertEqual(rates["over25"].tolist(), esperado.over25[idx].tolist())
+            self.assertEqual(rates["btts"].tolist(), esperado.btts[idx].tolist())
+            self.assertEqual(rates["media_gols"].tolist(), esperado.media_gols[idx].tolist())
+            self.assertEqual(rates["media_cartoes"].tolist(), esperado.media_cartoes[idx].tolist())
+            self.assertEqual(rates["media_escanteios"].tolist(), esperado.media_escanteios[idx].tolist())
+
+        with self.assertRaises(ValueError):
+            engine.taxas(engine.indices(team_ids), FORM_WINDOW + 1)
+
+
+class SincronizarRecomendacoesTests(PartidasMixin, TestCase):
+    def recomendacao(self, match, bet_type, odd):
+        return BetRecommendation(
+            match=match,
+            bet_type=bet_type,
+            bookmaker=self.bookmakers[0],
+            calculated_probability=Decimal("60.00"),
+            implied_probability=Decimal("50.00"),
+            odd_value=Decimal(odd),
+            expected_value=Decimal("0.20"),
+            value_percentage=Decimal("10.00"),
+            is_value_bet=True,
+            confidence="medium",
+        )
+
+    def test_insere_atualiza_e_remove(self):
+        start = self.now - timedelta(hours=1)
+        a, b = self.future[:2]
+
+        recs = [self.recomendacao(a, "over_25", "2.00"), self.recomendacao(a, "btts_yes", "1.90")]
+        self.assertEqual(sincronizar_recomendacoes(recs, start), (2, 0, 0))
+        over = BetRecommendation.objects.get(match=a, bet_type="over_25")
+
+        # Mesmos valores: nada é escrito
+        recs = [self.recomendacao(a, "over_25", "2.00"), self.recomendacao(a, "btts_yes", "1.90")]
+        self.assertEqual(sincronizar_recomendacoes(recs, start), (0, 0, 0))
+
+        recs = [self.recomendacao(a, "over_25", "2.10"), self.recomendacao(b, "home_win", "1.80")]
+        self.assertEqual(sincronizar_recomendacoes(recs, start), (1, 1, 1))
+
+        atualizada = BetRecommendation.objects.get(match=a, bet_type="over_25")
+        self.assertEqual((atualizada.id, atualizada.created_at), (over.id, over.created_at))
+        self.assertEqual(atualizada.odd_value, Decimal("2.10"))
+        self.assertEqual(
+            set(BetRecommendation.objects.values_list("match_id", "bet_type")),
+            {(a.id, "over_25"), (b.id, "home_win")},
+        )
+
+
+class BestOddsTests(PartidasMixin, TestCase):
+    def cotacao(self, match, bookmaker, market, outcome, price, line=None, fetched_at=None):
+        return OddsQuote.objects.create(
+            match=match, bookmaker=bookmaker, market=market, line=line, outcome=outcome,
+            price=Decimal(price), fetched_at=fetched_at or timezone.now(),
+        )
+
+    def test_maior_preco_por_mercado(self):
+        match = self.future[0]
+        casa0, casa1, casa2 = self.bookmakers
+        agora = timezone.now()
+        self.cotacao(match, casa0, "h2h", "home", "2.10")
+        self.cotacao(match, casa1, "h2h", "home", "2.30")
+        self.cotacao(match, casa2, "h2h", "home", "2.30", fetched_at=agora + timedelta(minutes=1))
+        self.cotacao(match, casa0, "totals", "over", "1.80", line=Decimal("2.5"))
+        self.cotacao(match, casa1, "totals", "over", "1.75", line=Decimal("2.5"))
+        self.cotacao(match, casa1, "totals", "over", "2.60", line=Decimal("3.5"))
+        self.cotacao(match, casa0, "spreads", "home", "1.95", line=Decimal("-1.5"))
+        self.cotacao(self.future[1], casa0, "h2h", "home", "9.00")  # outra partida
+
+        self.assertEqual(atualizar_best_odds([match.id]), 4)
+        best = {b.market: (b.price, b.bookmaker_id) for b in BestOdds.objects.filter(match=match)}
+        self.assertEqual(best, {
+            "home_win": (Decimal("2.30"), casa2.id),  # empate no preço: cotação mais recente
+            "over_25": (Decimal("1.80"), casa0.id),
+            "over_35": (Decimal("2.60"), casa1.id),
+            "handicap_home_-1.5": (Decimal("1.95"), casa0.id),
+        })
+        self.assertFalse(BestOdds.objects.filter(match=self.future[1]).exists())
+
+        # Cotação removida: o melhor preço é recalculado a partir das restantes
+        OddsQuote.objects.filter(match=match, bookmaker=casa2).delete()
+        atualizar_best_odds([match.id])
+        home = BestOdds.objects.get(match=match, market="home_win")
+        self.assertEqual((home.price, home.bookmaker_id), (Decimal("2.30"), casa1.id))
+
+
+class ArbitragemTests(PartidasMixin, TestCase):
+    def best(self, match, market, price, bookmaker):
+        BestOdds.objects.create(
+            match=match, market=market, price=Decimal(price), bookmaker=bookmaker, fetched_at=timezone.now()
+        )
+
+    def test_divisao_do_stake(self):
+        arb, sem_arb = self.future[:2]
+        casa0, casa1, casa2 = self.bookmakers
+        self.best(arb, "home_win", "2.20", casa0)
+        self.best(arb, "draw", "3.90", casa1)
+        self.best(arb, "away_win", "4.50", casa2)
+        self.best(arb, "over_25", "2.10", casa0)  # sem o under: conjunto incompleto
+        self.best(sem_arb, "home_win", "1.80", casa0)
+        self.best(sem_arb, "draw", "3.40", casa1)
+        self.best(sem_arb, "away_win", "4.00", casa2)
+
+        results = escanear_arbitragem(self.now - timedelta(days=1), self.now + timedelta(days=3), stake=100.0)
+        self.assertEqual([(r["match_id"], r["market"]) for r in results], [(arb.id, "1x2")])
+
+        result = results[0]
+        total = 1 / 2.2 + 1 / 3.9 + 1 / 4.5
+        self.assertAlmostEqual(result["inverse_sum"], round(total, 4))
+        self.assertAlmostEqual(result["profit_pct"], round((1 / total - 1) * 100, 2))
+        self.assertAlmostEqual(sum(leg["stake"] for leg in result["legs"]), 100.0, places=1)
+        for leg in result["legs"]:
+            # Mesmo retorno em qualquer resultado
+            self.assertAlmostEqual(leg["stake"] * leg["odd"], result["payout"], delta=0.02)
+
+        self.assertEqual(escanear_arbitragem(self.now - timedelta(days=1), self.now + timedelta(days=3), min_profit=50), [])
+
+
+class OddsHistoryTests(PartidasMixin, TestCase):
+    def evento(self, match, home_price):
+        return {
+            "id": "ev1",
+            "home_team": match.home_team.name,
+            "away_team": match.away_team.name,
+            "commence_time": match.date.isoformat(),
+            "bookmakers": [{"key": "betway", "title": "Betway", "markets": [
+                {"key": "h2h", "outcomes": [
+                    {"name": match.home_team.name, "price": home_price},
+                    {"name": match.away_team.name, "price": 4.1},
+                    {"name": "Draw", "price": 3.5},
+                ]},
+                {"key": "totals", "outcomes": [
+                    {"name": "Over", "point": 2.5, "price": 1.9},
+                    {"name": "Under", "point": 2.5, "price": 1.95},
+                ]},
+            ]}],
+        }
+
+    def importar(self, match, home_price):
+        with contextlib.redirect_stdout(io.StringIO()):
+            async_to_sync(odds_api.process_and_save_odds)([self.evento(match, home_price)], None, 2)
+
+    def test_grava_apenas_quando_o_preco_muda(self):
+        match = Match.objects.select_related("home_team", "away_team").get(id=self.future[0].id)
+
+        self.importar(match, 2.0)
+        self.assertEqual(OddsHistory.objects.filter(match=match).count(), 5)
+
+        self.importar(match, 2.0)
+        self.assertEqual(OddsHistory.objects.filter(match=match).count(), 5)
+
+        self.importar(match, 2.2)
+        self.importar(match, 2.0)
+        self.assertEqual(
+            list(OddsHistory.objects.filter(match=match, market="home_win").order_by("id").values_list("price", flat=True)),
+            [200, 220, 200],
+        )
+        self.assertEqual(OddsHistory.objects.filter(match=match).count(), 7)
+        self.assertEqual(BestOdds.objects.get(match=match, market="home_win").price, Decimal("2.00"))
+
+
+class FingerprintTests(PartidasMixin, TestCase):
+    def setUp(self):
+        reconstruir_team_form()
+        self.matches = self.partidas(Match.objects.filter(home_score__isnull=True))
+
+    def test_pula_partidas_sem_mudanca(self):
+        self.assertEqual(salvar_analises(self.matches), (len(self.matches), 0))
+        self.assertEqual(salvar_analises(self.matches), (0, len(self.matches)))
+        self.assertEqual(salvar_analises(self.matches, force=True), (len(self.matches), 0))
+
+    def test_recalcula_com_odds_novas(self):
+        salvar_analises(self.matches)
+        match = self.matches[0]
+        BestOdds.objects.create(
+            match=match, market="over_25", price=Decimal("1.90"), bookmaker=self.bookmakers[0], fetched_at=timezone.now()
+        )
+        self.assertEqual(salvar_analises(self.matches), (1, len(self.matches) - 1))
+        self.assertEqual(MatchAnalysis.objects.get(match=match).best_by_market["over_25"]["odd"], 1.9)
+
+        # Nova importação com o mesmo preço: só o horário muda
+        BestOdds.objects.filter(match=match).update(fetched_at=timezone.now() + timedelta(minutes=5))
+        self.assertEqual(salvar_analises(self.matches), (0, len(self.matches)))
+
+        BestOdds.objects.filter(match=match).update(price=Decimal("2.05"))
+        self.assertEqual(salvar_analises(self.matches), (1, len(self.matches) - 1))
+
+    def test_recalcula_com_cartoes_e_escanteios_novos(self):
+        salvar_analises(self.matches)
+        team = self.teams[0]
+        ultimo = (
+            Match.objects.filter(Q(home_team=team) | Q(away_team=team), home_score__isnull=False)
+            .order_by("-date", "-id").first()
+        )
+        afetadas = [m for m in self.matches if team.id in (m.home_team_id, m.away_team_id)]
+        antes = {m.id: MatchAnalysis.objects.get(match=m).insights for m in afetadas}
+
+        for _ in range(4):
+            MatchEvent.objects.create(match=ultimo, team=team, type="Card", minute=90)
+        TeamStatistics.objects.update_or_create(match=ultimo, team=team, defaults={"corner_kicks": 15})
+
+        self.assertEqual(salvar_analises(self.matches), (len(afetadas), len(self.matches) - len(afetadas)))
+        for match in afetadas:
+            self.assertNotEqual(MatchAnalysis.objects.get(match=match).insights, antes[match.id])
+
+
+class CLVTests(PartidasMixin, TestCase):
+    def odds(self, match, over_25):
+        MatchOdds.objects.update_or_create(
+            match=match, bookmaker=self.bookmakers[0], defaults={"over_25_odd": Decimal(over_25)}
+        )
+
+    def fechamento(self, match, price):
+        OddsHistory.objects.create(
+            match=match, bookmaker=self.bookmakers[0], market="over_25", price=price,
+            fetched_at=match.date - timedelta(hours=1),
+        )
+
+    def iniciar(self, match):
+        # Partida começa agora: desloca o histórico junto com o kickoff
+        delta = timezone.now() - Match.objects.get(id=match.id).date
+        Match.objects.filter(id=match.id).update(date=F("date") + delta)
+        OddsHistory.objects.filter(match=match).update(fetched_at=F("fetched_at") + delta)
+
+    def test_clv_usa_o_preco_da_primeira_recomendacao(self):
+        match = self.future[0]
+        self.odds(match, "8.00")
+        get_best_value_bets()
+        rec = BetRecommendation.objects.get(match=match, bet_type="over_25")
+        self.assertEqual(rec.recommended_odd, Decimal("8.00"))
+
+        # Importação seguinte com outro preço: odd_value acompanha, o preço recomendado não
+        self.odds(match, "6.00")
+        get_best_value_bets()
+        atualizada = BetRecommendation.objects.get(id=rec.id)
+        self.assertEqual(atualizada.odd_value, Decimal("6.00"))
+        self.assertEqual((atualizada.recommended_odd, atualizada.recommended_at), (rec.recommended_odd, rec.recommended_at))
+
+        # Depois do kickoff, odds ao vivo não alteram a recomendação
+        self.fechamento(match, 640)
+        self.iniciar(match)
+        self.odds(match, "9.00")
+        get_best_value_bets()
+        self.assertEqual(BetRecommendation.objects.get(id=rec.id).odd_value, Decimal("6.00"))
+
+        self.assertEqual(avaliar_clv(), (1, 1))
+        rec.refresh_from_db()
+        self.assertEqual(rec.closing_odd, Decimal("6.40"))
+        self.assertAlmostEqual(rec.clv, 25.0)
+
+    def test_execucoes_incrementais_iguais_a_completa(self):
+        a, b, c = self.future[:3]
+        for match, odd, closing in ((a, "8.00", 700), (b, "7.00", 760)):
+            self.odds(match, odd)
+            self.fechamento(match, closing)
+        get_best_value_bets()
+        self.assertEqual(avaliar_clv(), (0, 0))
+
+        self.iniciar(a)
+        self.assertEqual(avaliar_clv(), (1, 1))
+        self.assertEqual(avaliar_clv(), (0, 0))
+
+        # c começa antes da próxima execução, mas a recomendação só é criada depois dela
+        self.fechamento(c, 500)
+        self.iniciar(c)
+        self.assertEqual(avaliar_clv(), (0, 0))
+        BetRecommendation.objects.create(
+            match=c,
+            bet_type="over_25",
+            bookmaker=self.bookmakers[0],
+            calculated_probability=Decimal("60.00"),
+            implied_probability=Decimal("18.18"),
+            odd_value=Decimal("5.50"),
+            expected_value=Decimal("2.30"),
+            value_percentage=Decimal("41.82"),
+            is_value_bet=True,
+            confidence="high",
+            recommended_odd=Decimal("5.50"),
+            recommended_at=timezone.now(),
+        )
+
+        self.iniciar(b)
+        self.assertEqual(avaliar_clv(), (2, 2))
+
+        def resumo():
+            return sorted(CLVSummary.objects.values_list("market", "league_id", "bookmaker_id", "bets", "beat_closing"))
+
+        incremental = resumo()
+        soma = {s.league_id: s.clv_sum for s in CLVSummary.objects.all()}
+        self.assertEqual(avaliar_clv(full=True), (3, 3))
+        self.assertEqual(resumo(), incremental)
+        for s in CLVSummary.objects.all():
+            self.assertAlmostEqual(s.clv_sum, soma[s.league_id])
+
+
+class ValueBetsViewTests(TestCase):
+    def test_parametros_invalidos_retornam_400(self):
+        for query in ("limit=abc", "limit=-1", "limit=0", "days_ahead=x", "min_edge=abc"):
+            response = self.client.get(f"/api/value-bets/?{query}")
+            self.assertEqual(response.status_code, 400, query)
+        self.assertEqual(self.client.get("/api/value-bets/?limit=5&min_edge=0.05").status_code, 200)
+
+
+class FormSnapshotTests(PartidasMixin, TestCase):
+    def test_snapshot_legivel_por_outros_usuarios(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = escrever_snapshot(FormEngine.carregar(limit=FORM_WINDOW), 1, os.path.join(tmp, "team_form.bin"))
+            self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), 0o644)
+
+
+class ProbEnginesTests(TestCase):
+    def test_versao_precisa_ser_a_registrada(self):
+        poisson = get_engine("poisson")
+        self.assertIs(get_engine(poisson.key), poisson)
+        self.assertIsNone(get_engine(f"poisson:{poisson.version + 6}"))
+        self.assertIsNone(get_engine("inexistente"))
+        self.assertEqual(self.client.get(f"/api/value-bets/?engine=poisson:{poisson.version + 6}").status_code, 400)
+
+
+@override_settings(FORM_SNAPSHOT_PATH=os.path.join(tempfile.gettempdir(), "futstats-tests-sem-snapshot.bin"))
+class MatchSummaryViewTests(PartidasMixin, TestCase):
+    def setUp(self):
+        form_cache.clear()
+        reconstruir_team_form()
+        self.match = self.future[0]
+        salvar_analises(self.partidas(Match.objects.filter(id=self.match.id)), sample_limit=5)
+
+    def test_insights_usam_a_mesma_amostra(self):
+        response = self.client.get(f"/api/matches/{self.match.id}/?sample=3").json()
+
+        engine = FormEngine.carregar(limit=3).carregar_cartoes_escanteios()
+        match = Match.objects.select_related("home_team", "away_team").get(id=self.match.id)
+        self.assertEqual(response["sample_limit"], 3)
+        self.assertEqual(response["team_rates"]["home"]["sample_size"], 3)
+        self.assertEqual(response["insights"], gerar_insights_rapidos(match, engine))
+
+        padrao = self.client.get(f"/api/matches/{self.match.id}/").json()
+        self.assertEqual(padrao["sample_limit"], 5)
+        self.assertEqual(padrao["insights"], MatchAnalysis.objects.get(match=self.match).insights)
@@ -18,7 +18,10 @@ urlpatterns = [
     path('api/tendencias_rodada/', views.tendencias_rodada, name='tendencias_rodada'),
     path("api/times_destaque/", views.times_em_destaque, name="times_em_destaque"),
     path('api/value-bets/', views.value_bets, name='value_bets'),
+    path('api/value-bets/portfolio/', views.value_bets_portfolio, name='value_bets_portfolio'),
+    path('api/arbitrage/', views.arbitrage, name='arbitrage'),
     path('api/debug-odds/', views.debug_odds, name='debug_odds'),
+    path('api/debug-cache/', views.debug_cache, name='debug_cache'),
     path('api/bookmakers/available/', views.available_bookmakers, name='available_bookmakers'),
 
 ]
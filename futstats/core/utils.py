@@ -1,48 +1,410 @@
-from django.db.models import Q, Count
-from .models import Match, MatchEvent, TeamStatistics
-from datetime import date
+import hashlib
+
+import numpy as np
+from django.db import connection, transaction
+from django.db.models import F, Q, Count, Window
+from django.db.models.functions import RowNumber
+from .models import (
+    Match, MatchEvent, Team, TeamStatistics, TeamForm, PendingAnalysis, OddsQuote, BestOdds, OddsHistory,
+)
+from .markets import market_for
+from .stats_engine import FormEngine, FORM_WINDOW
+from .form_cache import incrementar_versao
+from .prob_engines import engines, get_engine
+from django.utils import timezone
+from datetime import date, datetime, timezone as dt_timezone
 
 
 # ============================================================
-# ✅ PRE-CARREGA últimos jogos de TODOS os times
+# ✅ Registro compacto de jogo finalizado (usado nos caches de forma)
 # ============================================================
-def preload_ultimos_jogos(limit=5):
+class JogoResumo:
     """
-    Carrega os últimos `limit` jogos FINALIZADOS de todos os times de uma vez.
-    Retorna um dicionário: { team_id: [jogos] }
+    Apenas os campos usados nos cálculos (mesmos nomes de `Match`), sem estado de
+    model do Django nem times hidratados.
     """
-    # Buscar apenas partidas finalizadas (com placar) e ordenadas por data
-    jogos = (
-        Match.objects
-        .select_related("home_team", "away_team")
-        .filter(
-            home_score__isnull=False,
-            away_score__isnull=False
+
+    __slots__ = ("id", "date", "home_team_id", "away_team_id", "home_score", "away_score")
+
+    def __init__(self, id, date, home_team_id, away_team_id, home_score, away_score):
+        self.id = id
+        self.date = date
+        self.home_team_id = home_team_id
+        self.away_team_id = away_team_id
+        self.home_score = home_score
+        self.away_score = away_score
+
+    def __repr__(self):
+        return (
+            f"JogoResumo({self.id}: {self.home_team_id} {self.home_score} x "
+            f"{self.away_score} {self.away_team_id} @ {self.date:%Y-%m-%d})"
+        )
+
+
+# ============================================================
+# ✅ PRE-CARREGA últimos jogos dos times (janela por time no SQL)
+# ============================================================
+def _ultimos_jogos(limit, team_ids=None):
+    """
+    Retorna linhas (team_id, id, date, home_team_id, away_team_id, home_score,
+    away_score) com os últimos `limit` jogos FINALIZADOS de cada time, ordenadas
+    do mais recente para o mais antigo.
+
+    O corte por time é feito no banco com ROW_NUMBER() OVER (PARTITION BY time),
+    sobre a união dos jogos como mandante e como visitante. Assim o custo depende
+    de `limit` x quantidade de times, e não do histórico inteiro. As colunas do
+    jogo vêm na própria consulta (sem segunda ida ao banco por id).
+    """
+    table = connection.ops.quote_name(Match._meta.db_table)
+
+    home_filter = ""
+    away_filter = ""
+    params = []
+    if team_ids is not None:
+        placeholders = ", ".join(["%s"] * len(team_ids))
+        home_filter = f" AND m.home_team_id IN ({placeholders})"
+        away_filter = f" AND m.away_team_id IN ({placeholders})"
+        params = [*team_ids, *team_ids]
+
+    colunas = "m.id, m.date, m.home_team_id, m.away_team_id, m.home_score, m.away_score"
+    sql = f"""
+        WITH jogos_time AS (
+            SELECT m.home_team_id AS team_id, {colunas}
+            FROM {table} m
+            WHERE m.home_score IS NOT NULL AND m.away_score IS NOT NULL{home_filter}
+            UNION ALL
+            SELECT m.away_team_id AS team_id, {colunas}
+            FROM {table} m
+            WHERE m.home_score IS NOT NULL AND m.away_score IS NOT NULL{away_filter}
+        ),
+        ranqueados AS (
+            SELECT
+                *,
+                ROW_NUMBER() OVER (
+                    PARTITION BY team_id ORDER BY date DESC, id DESC
+                ) AS posicao
+            FROM jogos_time
+        )
+        SELECT team_id, id, date, home_team_id, away_team_id, home_score, away_score
+        FROM ranqueados
+        WHERE posicao <= %s
+        ORDER BY team_id, posicao
+    """
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [*params, limit])
+        return cursor.fetchall()
+
+
+def _conversor_data():
+    """
+    Converte `date` vindo do cursor cru como o ORM faria (no SQLite chega como
+    texto; no Postgres já é datetime e a lista de conversores é vazia).
+    """
+    field = Match._meta.get_field("date")
+    col = field.get_col(Match._meta.db_table)
+    conversores = connection.ops.get_db_converters(col) + field.get_db_converters(connection)
+
+    def converter(value):
+        for conversor in conversores:
+            value = conversor(value, col, connection)
+        return value
+
+    return converter
+
+
+def preload_ultimos_jogos(limit=5, team_ids=None):
+    """
+    Carrega os últimos `limit` jogos FINALIZADOS dos times em uma única consulta.
+    Retorna um dicionário: { team_id: [JogoResumo] }
+
+    - team_ids: se informado, carrega apenas esses times (ex.: times que jogam
+      na janela analisada). Se None, carrega todos os times.
+    """
+    if team_ids is not None:
+        team_ids = sorted({tid for tid in team_ids if tid is not None})
+        if not team_ids:
+            return {}
+
+    converter_data = _conversor_data()
+
+    # Um JogoResumo por partida, compartilhado entre mandante e visitante
+    jogos = {}
+    cache = {}
+
+    for team_id, match_id, *campos in _ultimos_jogos(limit, team_ids):
+        jogo = jogos.get(match_id)
+        if jogo is None:
+            date, home_team_id, away_team_id, home_score, away_score = campos
+            jogo = jogos[match_id] = JogoResumo(
+                match_id, converter_data(date), home_team_id, away_team_id, home_score, away_score,
+            )
+        cache.setdefault(team_id, []).append(jogo)
+
+    return cache
+
+
+# ============================================================
+# ✅ TeamForm: forma recente persistida e atualizada a cada resultado
+# ============================================================
+def _resultado_do_time(match, team_id):
+    """
+    Converte uma partida finalizada no registro de forma do ponto de vista do time.
+    """
+    home_score = int(match.home_score)
+    away_score = int(match.away_score)
+    is_home = match.home_team_id == team_id
+
+    return {
+        "match_id": match.id,
+        "date": match.date.astimezone(dt_timezone.utc).isoformat(),
+        "opponent_id": match.away_team_id if is_home else match.home_team_id,
+        "is_home": is_home,
+        "goals_for": home_score if is_home else away_score,
+        "goals_against": away_score if is_home else home_score,
+        "over_25": (home_score + away_score) >= 3,
+        "btts": home_score > 0 and away_score > 0,
+    }
+
+
+def _ordenar_resultados(results):
+    # Mesma ordem do preload: mais recente primeiro, desempate pelo id.
+    results.sort(key=lambda r: (r["date"], r["match_id"]), reverse=True)
+    return results[:FORM_WINDOW]
+
+
+def registrar_resultado_team_form(match):
+    """
+    Atualiza incrementalmente o TeamForm dos dois times de uma partida com placar.
+    Idempotente: reimportar a mesma partida não altera nada.
+    Retorna True se a forma de algum time mudou.
+    """
+    if match.home_score is None or match.away_score is None:
+        return False
+
+    changed = False
+    with transaction.atomic():
+        for team_id in (match.home_team_id, match.away_team_id):
+            form, created = TeamForm.objects.select_for_update().get_or_create(team_id=team_id)
+            if created:
+                # Time ainda sem TeamForm: parte do histórico completo, não só deste jogo.
+                jogos = preload_ultimos_jogos(limit=FORM_WINDOW, team_ids=[team_id]).get(team_id, [])
+                form.results = _ordenar_resultados([_resultado_do_time(m, team_id) for m in jogos])
+
+            entry = _resultado_do_time(match, team_id)
+            if entry in form.results and not created:
+                continue
+
+            results = [r for r in form.results if r["match_id"] != match.id]
+            results.append(entry)
+
+            form.results = _ordenar_resultados(results)
+            form.last_match_date = datetime.fromisoformat(form.results[0]["date"])
+            form.save()
+            changed = True
+
+    return changed
+
+
+def reconstruir_team_form(team_ids=None):
+    """
+    Reconstrói TeamForm a partir das partidas finalizadas (carga inicial/correções).
+    Retorna a quantidade de times gravados.
+    """
+    cache = preload_ultimos_jogos(limit=FORM_WINDOW, team_ids=team_ids)
+
+    forms = []
+    for team_id, jogos in cache.items():
+        results = _ordenar_resultados([_resultado_do_time(m, team_id) for m in jogos])
+        forms.append(TeamForm(
+            team_id=team_id,
+            results=results,
+            last_match_date=datetime.fromisoformat(results[0]["date"]) if results else None,
+        ))
+
+    with transaction.atomic():
+        TeamForm.objects.bulk_create(
+            forms,
+            update_conflicts=True,
+            unique_fields=["team"],
+            update_fields=["results", "last_match_date", "updated_at"],
         )
-        .order_by("-date")
-        .all()
+        incrementar_versao()
+
+    return len(forms)
+
+
+def _jogo_de_resultado(team_id, r):
+    home_score, away_score = (
+        (r["goals_for"], r["goals_against"]) if r["is_home"]
+        else (r["goals_against"], r["goals_for"])
+    )
+    return JogoResumo(
+        id=r["match_id"],
+        date=datetime.fromisoformat(r["date"]),
+        home_team_id=team_id if r["is_home"] else r["opponent_id"],
+        away_team_id=r["opponent_id"] if r["is_home"] else team_id,
+        home_score=home_score,
+        away_score=away_score,
     )
 
+
+def carregar_forma_times(limit=5, team_ids=None):
+    """
+    Mesmo formato de `preload_ultimos_jogos` ({ team_id: [jogos] }), mas lendo
+    uma linha de TeamForm por time em vez de consultar a tabela de partidas.
+
+    Times sem TeamForm, com menos de `limit` jogos guardados (linha incompleta ou
+    time com poucos jogos) ou `limit` maior que FORM_WINDOW caem no preload via SQL.
+    """
+    if limit > FORM_WINDOW:
+        return preload_ultimos_jogos(limit=limit, team_ids=team_ids)
+
+    forms = TeamForm.objects.all()
+    if team_ids is not None:
+        team_ids = {tid for tid in team_ids if tid is not None}
+        if not team_ids:
+            return {}
+        forms = forms.filter(team_id__in=team_ids)
+
     cache = {}
+    for team_id, results in forms.values_list("team_id", "results"):
+        if results and len(results) >= limit:
+            cache[team_id] = [_jogo_de_resultado(team_id, r) for r in results[:limit]]
 
-    for match in jogos:
-        # Home team
-        tid_home = match.home_team_id
-        cache.setdefault(tid_home, [])
-        if len(cache[tid_home]) < limit:
-            cache[tid_home].append(match)
-
-        # Away team
-        tid_away = match.away_team_id
-        cache.setdefault(tid_away, [])
-        if len(cache[tid_away]) < limit:
-            cache[tid_away].append(match)
+    if team_ids is None:
+        # Tabela ainda não populada: carrega tudo via SQL.
+        if not cache:
+            return preload_ultimos_jogos(limit=limit)
+        team_ids = set(Team.objects.values_list("id", flat=True))
+
+    faltando = team_ids - set(cache)
+    if faltando:
+        cache.update(preload_ultimos_jogos(limit=limit, team_ids=faltando))
 
     return cache
 
 
+# ============================================================
+# ✅ Melhor preço por (partida, mercado) (BestOdds), mantido pelo importador
+# ============================================================
+def atualizar_best_odds(match_ids):
+    """
+    Recalcula as BestOdds das partidas informadas a partir das OddsQuote:
+    ROW_NUMBER por (partida, mercado, linha, resultado), maior preço primeiro
+    (empate: cotação mais recente), só das partidas tocadas.
+    Retorna quantas linhas foram gravadas.
+    """
+    match_ids = list(match_ids)
+    if not match_ids:
+        return 0
+
+    ranked = (
+        OddsQuote.objects.filter(match_id__in=match_ids)
+        .annotate(rank=Window(
+            expression=RowNumber(),
+            partition_by=[F("match_id"), F("market"), F("line"), F("outcome")],
+            order_by=[F("price").desc(), F("fetched_at").desc(), F("id").asc()],
+        ))
+        .filter(rank=1)
+        .values_list("match_id", "market", "line", "outcome", "price", "bookmaker_id", "fetched_at")
+    )
+
+    rows = []
+    for match_id, api_market, line, outcome, price, bookmaker_id, fetched_at in ranked:
+        market = market_for(api_market, outcome, line)
+        if market is None:
+            continue
+        rows.append(BestOdds(
+            match_id=match_id,
+            market=market.key,
+            price=price,
+            bookmaker_id=bookmaker_id,
+            fetched_at=fetched_at,
+        ))
+
+    with transaction.atomic():
+        BestOdds.objects.filter(match_id__in=match_ids).delete()
+        BestOdds.objects.bulk_create(rows, batch_size=1000)
+
+    return len(rows)
+
+
+# ============================================================
+# ✅ Histórico de odds (OddsHistory): só grava quando o preço muda
+# ============================================================
+def preco_int(price):
+    """Odd decimal -> inteiro (odd x 100), formato do OddsHistory."""
+    return int(round(float(price) * 100))
+
+
+def ultimos_precos(match_ids):
+    """
+    Último preço gravado no histórico de cada (partida, bookmaker, mercado),
+    em uma consulta: { (match_id, bookmaker_id, market): preço x 100 }.
+    """
+    match_ids = list(match_ids)
+    if not match_ids:
+        return {}
+
+    latest = (
+        OddsHistory.objects.filter(match_id__in=match_ids)
+        .annotate(rank=Window(
+            expression=RowNumber(),
+            partition_by=[F("match_id"), F("bookmaker_id"), F("market")],
+            order_by=[F("fetched_at").desc(), F("id").desc()],
+        ))
+        .filter(rank=1)
+        .values_list("match_id", "bookmaker_id", "market", "price")
+    )
+    return {(match_id, bookmaker_id, market): price for match_id, bookmaker_id, market, price in latest}
+
+
+# ============================================================
+# ✅ Fila de reanálise (PendingAnalysis), preenchida pelos importadores
+# ============================================================
+def enfileirar_reanalise(match_ids, reason):
+    """
+    Marca partidas para o `reanalisar_pendentes`. Partidas já na fila têm
+    `queued_at` renovado (o consumo só remove o que leu antes da mudança).
+    Retorna a quantidade de partidas enfileiradas.
+    """
+    match_ids = {mid for mid in match_ids if mid is not None}
+    if not match_ids:
+        return 0
+
+    agora = timezone.now()
+    PendingAnalysis.objects.bulk_create(
+        [PendingAnalysis(match_id=mid, reason=reason, queued_at=agora) for mid in match_ids],
+        update_conflicts=True,
+        unique_fields=["match"],
+        update_fields=["reason", "queued_at"],
+    )
+    return len(match_ids)
+
+
+def enfileirar_proximos_jogos(team_ids, reason):
+    """
+    Enfileira todas as próximas partidas (ainda sem placar) dos times, ex.: quando
+    um resultado novo muda a forma deles.
+    """
+    team_ids = {tid for tid in team_ids if tid is not None}
+    if not team_ids:
+        return 0
+
+    inicio_hoje = timezone.make_aware(datetime.combine(timezone.localdate(), datetime.min.time()))
+    match_ids = (
+        Match.objects
+        .filter(Q(home_team_id__in=team_ids) | Q(away_team_id__in=team_ids))
+        .filter(date__gte=inicio_hoje, home_score__isnull=True)
+        .values_list("id", flat=True)
+    )
+    return enfileirar_reanalise(match_ids, reason)
+
+
 # ============================================================
 # ✅ Funções agora usam o CACHE
+# (dict { team_id: [jogos] } ou FormEngine, que já traz as taxas prontas)
 # ============================================================
 def _smoothed_percent(hits, n, alpha=1, beta=1, max_pct=95):
     """
@@ -64,7 +426,16 @@ def _smoothed_percent(hits, n, alpha=1, beta=1, max_pct=95):
     return min(effective_max, max(0, pct))
 
 
+def _ids_da_amostra(team, cache):
+    if isinstance(cache, FormEngine):
+        return cache.match_ids_de(team.id)
+    return [m.id for m in cache.get(team.id, [])]
+
+
 def calcular_over25(team, cache):
+    if isinstance(cache, FormEngine):
+        return cache.over25_de(team.id)
+
     jogos = cache.get(team.id, [])
     if not jogos:
         return 0
@@ -79,6 +450,9 @@ def calcular_over25(team, cache):
 
 
 def calcular_btts(team, cache):
+    if isinstance(cache, FormEngine):
+        return cache.btts_de(team.id)
+
     jogos = cache.get(team.id, [])
     if not jogos:
         return 0
@@ -93,30 +467,44 @@ def calcular_btts(team, cache):
 
 
 def calcular_media_cartoes(team, cache):
-    jogos = cache.get(team.id, [])
-    if not jogos:
+    # Engine com cartões pré-carregados (1 consulta agrupada por execução)
+    if isinstance(cache, FormEngine) and cache.media_cartoes is not None:
+        return cache.media_cartoes_de(team.id)
+
+    ids = _ids_da_amostra(team, cache)
+    if not ids:
         return 0
 
     eventos = MatchEvent.objects.filter(
         Q(team=team),
-        type="Card"
+        type="Card",
+        match_id__in=ids,
     ).count()
 
-    return round(eventos / len(jogos), 1)
+    return round(eventos / len(ids), 1)
 
 
 def calcular_media_escanteios(team, cache):
-    stats = TeamStatistics.objects.filter(team=team)
-    if not stats.exists():
+    # Engine com escanteios pré-carregados (1 consulta agrupada por execução)
+    if isinstance(cache, FormEngine) and cache.media_escanteios is not None:
+        return cache.media_escanteios_de(team.id)
+
+    ids = _ids_da_amostra(team, cache)
+    corners = list(
+        TeamStatistics.objects
+        .filter(team=team, match_id__in=ids)
+        .values_list("corner_kicks", flat=True)
+    )
+    if not corners:
         return 0
 
-    total_games = stats.count()
-    total_corners = sum(stat.corner_kicks or 0 for stat in stats)
-
-    return round(total_corners / total_games, 1)
+    return round(sum(c or 0 for c in corners) / len(corners), 1)
 
 
 def calcular_media_gols(team, cache):
+    if isinstance(cache, FormEngine):
+        return cache.media_gols_de(team.id)
+
     jogos = cache.get(team.id, [])
     if not jogos:
         return 0
@@ -136,6 +524,10 @@ def calcular_media_gols(team, cache):
 # ✅ Insights que agora usam o CACHE
 # ============================================================
 def gerar_insights_rapidos(match, cache):
+    """
+    Com um FormEngine que já chamou `carregar_cartoes_escanteios()`, não faz
+    nenhuma consulta ao banco.
+    """
     home = match.home_team
     away = match.away_team
 
@@ -174,6 +566,141 @@ def gerar_insights_rapidos(match, cache):
     return insights
 
 
+# ============================================================
+# ✅ Probabilidades da partida a partir das taxas de forma
+# ============================================================
+# Incrementar quando a heurística/formato da análise mudar (invalida os fingerprints).
+ANALISE_VERSAO = 1
+
+# Mercados com probabilidade calculada comparados com a melhor odd (MarketEdge / value bets).
+VALUE_MARKETS = ["over_25", "btts_yes", "home_win", "draw", "away_win"]
+
+
+def fingerprint_analise(home_match_ids, away_match_ids, sample_limit, best_by_market, kickoff=None,
+                        home_cards_corners=None, away_cards_corners=None):
+    """
+    Hash das entradas de uma análise: jogos da amostra de cada time, tamanho da
+    amostra, versão do modelo e dos engines de probabilidade, melhores odds por
+    mercado, horário da partida e cartões/escanteios dos jogos da amostra
+    (`FormEngine.cartoes_escanteios_de`), que mudam com eventos/estatísticas
+    importados depois do resultado.
+
+    Das odds entram só valor e casa (não o `last_updated`): cada importação
+    regrava o horário de todas as odds, mesmo sem mudança de preço.
+    """
+    def _cards_corners(value):
+        cards, corners = value or ([], [])
+        return ",".join(map(str, cards)) + "/" + ",".join(map(str, corners))
+
+    def _odds(value):
+        return ",".join(
+            f"{market}:{best['odd']}:{best['bookmaker']}:{int(best['is_brazilian'])}"
+            for market, best in sorted((value or {}).items())
+            if best
+        )
+
+    raw = "|".join([
+        f"v{ANALISE_VERSAO}",
+        ",".join(engine.key for engine in engines()),
+        f"n{sample_limit}",
+        kickoff.isoformat() if kickoff else "",
+        ",".join(map(str, home_match_ids)),
+        ",".join(map(str, away_match_ids)),
+        _odds(best_by_market),
+        _cards_corners(home_cards_corners),
+        _cards_corners(away_cards_corners),
+    ])
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def implied_prob(odd):
+    """Probabilidade implícita (%) de uma odd decimal."""
+    if not odd or odd <= 0:
+        return None
+    return round(100 / float(odd), 2)
+
+
+def edges_da_analise(probabilities, best_by_market):
+    """
+    Linhas de MarketEdge (dicts) de uma análise: para cada mercado de VALUE_MARKETS
+    com probabilidade e melhor odd, a prob. implícita e a diferença (edge).
+    """
+    edges = []
+    for market in VALUE_MARKETS:
+        best_market = (best_by_market or {}).get(market)
+        if not best_market or best_market.get("odd") is None:
+            continue
+
+        odd = float(best_market["odd"])
+        implied = implied_prob(odd)
+        calc = (probabilities or {}).get(market)
+        if calc is None or implied is None:
+            continue
+
+        edges.append({
+            "market": market,
+            "calculated_probability": float(calc),
+            "best_odd": round(odd, 2),
+            "implied_probability": float(implied),
+            "edge": round(float(calc) - float(implied), 2),
+            "bookmaker": best_market.get("bookmaker"),
+            "is_brazilian_bookmaker": bool(best_market.get("is_brazilian")),
+        })
+    return edges
+
+
+def team_rates_da_forma(home, away, sample_limit):
+    """
+    Monta `team_rates` (formato do MatchAnalysis) a partir das taxas de forma
+    de mandante e visitante.
+
+    - home / away: dicts com sample_size, over25 e btts
+      (ex.: linhas de `FormEngine.taxas`)
+    """
+    home_sample = int(home["sample_size"])
+    away_sample = int(away["sample_size"])
+
+    min_sample = min(home_sample, away_sample)
+    if min_sample >= sample_limit:
+        sample_quality = "boa"
+    elif min_sample >= max(3, sample_limit - 2):
+        sample_quality = "média"
+    else:
+        sample_quality = "baixa"
+
+    return {
+        "home": {
+            "sample_size": home_sample,
+            "over_25": int(home["over25"]),
+            "btts_yes": int(home["btts"]),
+        },
+        "away": {
+            "sample_size": away_sample,
+            "over_25": int(away["over25"]),
+            "btts_yes": int(away["btts"]),
+        },
+        "sample_limit": sample_limit,
+        "quality": sample_quality,
+    }
+
+
+def analise_da_forma(home, away, sample_limit, engine=None):
+    """
+    Monta `probabilities` (do engine informado ou do padrão, ver `prob_engines`)
+    e `team_rates` de UMA partida a partir das taxas de mandante e visitante.
+    """
+    engine = engine or get_engine()
+    probs = engine.calcular(
+        {k: np.asarray([v]) for k, v in home.items()},
+        {k: np.asarray([v]) for k, v in away.items()},
+    )
+
+    return {
+        "probabilities": {market: round(float(values[0]), 2) for market, values in probs.items()},
+        "team_rates": team_rates_da_forma(home, away, sample_limit),
+    }
+
+
 # ============================================================
 # ✅ Função para obter range de datas de uma season
 # ============================================================
@@ -5,7 +5,11 @@ from .utils import (
     calcular_btts,
     calcular_media_gols,
     get_season_date_range,
+    analise_da_forma,
+    FORM_WINDOW,
 )
+from .prob_engines import DEFAULT_ENGINE, engines, get_engine
+from .markets import ODD_FIELD, ODD_FIELDS, get_market
 from django.utils import timezone
 from rest_framework.response import Response
 from datetime import date, datetime, timedelta
@@ -24,6 +28,8 @@ from .models import (
     MatchOdds,
     BetRecommendation,
     MatchAnalysis,
+    MarketEdge,
+    BestOdds,
 )
 from dotenv import load_dotenv
 import os
@@ -219,7 +225,33 @@ def match_summary(request, id):
     Esse endpoint é pensado para o frontend (Match page) exibir:
     - "Por que essa probabilidade?" (amostra e taxas)
     - insights e dados básicos do jogo
+
+    `?sample=N` (1 a FORM_WINDOW) recalcula probabilidades, taxas e insights com os
+    últimos N jogos a partir do engine de forma em memória (somas de prefixo), sem
+    consultar os jogos no banco. `sample_limit` na resposta indica a amostra usada.
+
+    `?engine=nome` escolhe o engine de probabilidade (ver `prob_engines`; padrão:
+    DEFAULT_ENGINE), lido de `engine_probabilities` quando já pré-calculado.
     """
+    prob_engine = get_engine(request.GET.get("engine"))
+    if prob_engine is None:
+        return Response(
+            {"detail": f"engine inválido. Opções: {', '.join(e.key for e in engines())}."},
+            status=400,
+        )
+
+    sample = request.GET.get("sample")
+    if sample is not None:
+        try:
+            sample = int(sample)
+        except ValueError:
+            sample = 0
+        if not 1 <= sample <= FORM_WINDOW:
+            return Response(
+                {"detail": f"sample deve ser um inteiro entre 1 e {FORM_WINDOW}."},
+                status=400,
+            )
+
     try:
         match = (
             Match.objects
@@ -240,6 +272,35 @@ def match_summary(request, id):
             status=404,
         )
 
+    probabilities = (analysis.engine_probabilities or {}).get(prob_engine.key)
+    if probabilities is None and prob_engine.name == DEFAULT_ENGINE:
+        probabilities = analysis.probabilities
+    team_rates = analysis.team_rates
+    insights = analysis.insights
+
+    # Amostra diferente da pré-calculada (ou engine sem resultado salvo): calcula
+    # a partir da forma em memória.
+    if (sample is not None and sample != analysis.sample_limit) or probabilities is None:
+        from .form_cache import get_form_engine
+
+        sample = sample or analysis.sample_limit
+        engine = get_form_engine(FORM_WINDOW)
+        rates = engine.taxas(engine.indices([match.home_team_id, match.away_team_id]), sample)
+        analise = analise_da_forma(
+            {k: v[0] for k, v in rates.items()},
+            {k: v[1] for k, v in rates.items()},
+            sample,
+            engine=prob_engine,
+        )
+        probabilities = analise["probabilities"]
+        team_rates = analise["team_rates"]
+
+        if sample != analysis.sample_limit:
+            # Insights com a mesma amostra das taxas (só os dois times, recortados em N jogos)
+            insights = gerar_insights_rapidos(
+                match, engine.subconjunto([match.home_team_id, match.away_team_id]).recortar(sample)
+            )
+
     # Formatar data: se hora for 00:00, mostrar apenas data
     match_date = match.date
     if match_date.hour == 0 and match_date.minute == 0:
@@ -264,9 +325,11 @@ def match_summary(request, id):
             "name": match.away_team.name,
             "logo": match.away_team.logo,
         },
-        "probabilities": analysis.probabilities,
-        "team_rates": analysis.team_rates,
-        "insights": analysis.insights,
+        "engine": prob_engine.key,
+        "sample_limit": sample or analysis.sample_limit,
+        "probabilities": probabilities,
+        "team_rates": team_rates,
+        "insights": insights,
         "generated_at": analysis.computed_at.isoformat() if analysis.computed_at else None,
     })
 
@@ -296,39 +359,40 @@ def match_odds(request, id):
     def f(x):
         return float(x) if x is not None else None
 
-    markets = [
-        ("home_win", "home_win_odd"),
-        ("draw", "draw_odd"),
-        ("away_win", "away_win_odd"),
-        ("over_25", "over_25_odd"),
-        ("under_25", "under_25_odd"),
-        ("btts_yes", "btts_yes_odd"),
-        ("btts_no", "btts_no_odd"),
-    ]
+    markets = ODD_FIELDS
+
+    # Melhor preço por mercado já mantido pelo importador (BestOdds)
+    best_by_line = {}
+    for best in (
+        BestOdds.objects.filter(match=match)
+        .select_related("bookmaker")
+        .order_by("market")
+    ):
+        market = get_market(best.market)
+        if market is None:
+            continue
+        best_by_line[best.market] = {
+            "odd": f(best.price),
+            "label": market.label,
+            "line": f(market.line),
+            "bookmaker": best.bookmaker.name,
+            "is_brazilian": bool(best.bookmaker.is_brazilian),
+            "last_updated": best.fetched_at.isoformat() if best.fetched_at else None,
+        }
+
+    best_by_market = {
+        key: (
+            {k: v for k, v in best_by_line[key].items() if k not in ("label", "line")}
+            if key in best_by_line else None
+        )
+        for (key, _) in markets
+    }
 
     by_bookmaker = []
-    best_by_market = {key: None for (key, _) in markets}
 
     for row in odds_qs:
         bm = row.bookmaker
-        entry_markets = {}
-        for key, field in markets:
-            val = getattr(row, field)
-            entry_markets[key] = f(val)
-
-            if val is None:
-                continue
-            current = best_by_market.get(key)
-            odd_float = f(val)
-            if odd_float is None:
-                continue
-            if current is None or odd_float > current["odd"]:
-                best_by_market[key] = {
-                    "odd": odd_float,
-                    "bookmaker": bm.name if bm else None,
-                    "is_brazilian": bool(getattr(bm, "is_brazilian", False)),
-                    "last_updated": row.last_updated.isoformat() if row.last_updated else None,
-                }
+        entry_markets = {key: f(getattr(row, field)) for key, field in markets}
 
         by_bookmaker.append({
             "bookmaker": bm.name if bm else None,
@@ -347,6 +411,8 @@ def match_odds(request, id):
         },
         "best_by_market": best_by_market,
         "bookmakers": by_bookmaker,
+        # Todas as linhas de totais/handicap, melhor preço por mercado
+        "best_by_line": best_by_line,
     })
 
 @api_view(["GET"])
@@ -474,24 +540,26 @@ def odds_today(request):
 @api_view(["GET"])
 def tendencias_rodada(request):
     from datetime import timedelta
-    from .utils import preload_ultimos_jogos, gerar_insights_rapidos
+    from .form_cache import get_form_engine
+    from .utils import gerar_insights_rapidos
 
     agora = timezone.now()
     futuro = agora + timedelta(days=3)
 
-    cache = preload_ultimos_jogos()
-
-    proximos = (
+    proximos = list(
         Match.objects
         .select_related("home_team", "away_team", "league")
         .filter(date__gte=agora, date__lte=futuro)
         .order_by("date")
     )
 
+    # Forma de todos os times, reaproveitada entre requests até chegar resultado novo
+    engine = get_form_engine()
+
     resultados = []
 
     for match in proximos:
-        insights = gerar_insights_rapidos(match, cache)
+        insights = gerar_insights_rapidos(match, engine)
 
         resultados.append({
             "matchId": match.id,
@@ -971,43 +1039,51 @@ def value_bets(request):
     """
     Retorna as melhores probabilidades de cada tipo de aposta bater
     Ordenadas por probabilidade calculada (maior primeiro)
+
+    Lê a tabela MarketEdge (gravada pelo `precomputar_analises`): filtros
+    opcionais `league` (nome), `market`, `min_edge` e `engine` (engine de
+    probabilidade; padrão: DEFAULT_ENGINE) vão direto para o SQL.
     """
     from datetime import datetime, time
 
-    limit = int(request.GET.get("limit", 25))
-    days_ahead = int(request.GET.get("days_ahead", 3))
-    days_ahead = max(1, min(days_ahead, 7))
+    try:
+        limit = int(request.GET.get("limit", 25))
+        days_ahead = max(1, min(int(request.GET.get("days_ahead", 3)), 7))
+        min_edge = request.GET.get("min_edge")
+        min_edge = float(min_edge) if min_edge not in (None, "") else None
+    except ValueError:
+        return Response({"detail": "limit, days_ahead e min_edge devem ser numéricos."}, status=400)
+    if limit <= 0:
+        return Response({"detail": "limit deve ser maior que zero."}, status=400)
+    league = (request.GET.get("league") or "").strip()
+    market = (request.GET.get("market") or "").strip()
+    prob_engine = get_engine(request.GET.get("engine"))
+    if prob_engine is None:
+        return Response(
+            {"detail": f"engine inválido. Opções: {', '.join(e.key for e in engines())}."},
+            status=400,
+        )
 
     hoje = timezone.now().date()
     inicio = timezone.make_aware(datetime.combine(hoje, time.min))
     fim = inicio + timedelta(days=days_ahead)
 
-    matches = list(
-        Match.objects.filter(date__gte=inicio, date__lt=fim)
-        .select_related("home_team", "away_team", "league")
-        .order_by("date")
+    edges_qs = MarketEdge.objects.filter(engine=prob_engine.key, kickoff__gte=inicio, kickoff__lt=fim)
+    if league:
+        edges_qs = edges_qs.filter(league__name=league)
+    if market:
+        edges_qs = edges_qs.filter(market=market)
+    if min_edge is not None:
+        edges_qs = edges_qs.filter(edge__gte=min_edge)
+
+    edges = list(
+        edges_qs
+        .select_related("match__home_team", "match__away_team", "league")
+        .order_by("-calculated_probability", "kickoff", "match_id", "id")[:limit]
     )
-    if not matches:
+    if not edges:
         return Response([])
 
-    match_ids = [m.id for m in matches]
-
-    analyses = {
-        a.match_id: a
-        for a in MatchAnalysis.objects.filter(match_id__in=match_ids)
-    }
-
-    odds_rows = (
-        MatchOdds.objects.filter(match_id__in=match_ids)
-        .select_related("bookmaker")
-        .order_by("-last_updated")
-    )
-
-    # Agrupar odds por match para montar available_bookmakers por mercado
-    odds_by_match = {}
-    for row in odds_rows:
-        odds_by_match.setdefault(row.match_id, []).append(row)
-
     bet_name = {
         "over_25": "Mais de 2.5 Gols",
         "btts_yes": "Ambos Marcam (BTTS)",
@@ -1016,73 +1092,155 @@ def value_bets(request):
         "away_win": "Fora (2)",
     }
 
-    odd_field = {
-        "over_25": "over_25_odd",
-        "btts_yes": "btts_yes_odd",
-        "home_win": "home_win_odd",
-        "draw": "draw_odd",
-        "away_win": "away_win_odd",
-    }
+    odd_field = {key: ODD_FIELD[key] for key in bet_name}
 
-    def implied_prob(odd):
-        if not odd or odd <= 0:
-            return None
-        return round(100 / float(odd), 2)
+    # Odds por bookmaker só das partidas retornadas (available_bookmakers)
+    odds_by_match = {}
+    for row in (
+        MatchOdds.objects.filter(match_id__in={e.match_id for e in edges})
+        .order_by("-last_updated")
+        .values("match_id", "bookmaker__name", "bookmaker__is_brazilian", *odd_field.values())
+    ):
+        odds_by_match.setdefault(row["match_id"], []).append(row)
 
     results = []
-    for m in matches:
-        a = analyses.get(m.id)
-        if not a:
+    for e in edges:
+        m = e.match
+        field = odd_field[e.market]
+        available = [
+            {
+                "name": row["bookmaker__name"],
+                "odd": float(row[field]),
+                "is_brazilian": bool(row["bookmaker__is_brazilian"]),
+            }
+            for row in odds_by_match.get(m.id, [])
+            if row[field] is not None
+        ]
+
+        results.append(
+            {
+                "match_id": m.id,
+                "match": f"{m.home_team.name} x {m.away_team.name}",
+                "league": e.league.name if e.league else None,
+                "date": m.date.strftime("%d/%m %H:%M"),
+                "bet_type": e.market,
+                "bet_name": bet_name.get(e.market, e.market),
+                "odd": round(float(e.best_odd), 2),
+                "calculated_probability": e.calculated_probability,
+                "implied_probability": e.implied_probability,
+                "difference": e.edge,
+                "best_bookmaker": e.bookmaker,
+                "is_brazilian_bookmaker": e.is_brazilian_bookmaker,
+                "available_bookmakers": available,
+            }
+        )
+
+    return Response(results)
+
+@api_view(["GET"])
+def value_bets_portfolio(request):
+    """
+    Carteira sugerida das value bets (BetRecommendation) dos próximos dias:
+    Kelly fracionado de todas as apostas de uma vez, com teto por partida e
+    teto de exposição do dia. Só entra a melhor odd de cada (partida, mercado).
+
+    Parâmetros opcionais: `days_ahead` (1-7, padrão 1), `bankroll` (padrão 100),
+    `kelly` (fração do Kelly), `max_match` e `max_total` (frações da banca).
+    """
+    from datetime import datetime, time
+    from .betting_utils import (
+        KELLY_FRACTION,
+        MAX_DAILY_EXPOSURE,
+        MAX_STAKE_PER_MATCH,
+        dimensionar_carteira,
+    )
+
+    try:
+        days_ahead = max(1, min(int(request.GET.get("days_ahead", 1)), 7))
+        bankroll = float(request.GET.get("bankroll") or 100)
+        fraction = float(request.GET.get("kelly") or KELLY_FRACTION)
+        max_per_match = float(request.GET.get("max_match") or MAX_STAKE_PER_MATCH)
+        max_total = float(request.GET.get("max_total") or MAX_DAILY_EXPOSURE)
+    except ValueError:
+        return Response({"detail": "Parâmetros numéricos inválidos."}, status=400)
+    if bankroll <= 0 or not (0 < fraction <= 1) or not (0 < max_per_match <= 1) or not (0 < max_total <= 1):
+        return Response(
+            {"detail": "bankroll deve ser > 0; kelly, max_match e max_total entre 0 e 1."},
+            status=400,
+        )
+
+    hoje = timezone.now().date()
+    inicio = timezone.make_aware(datetime.combine(hoje, time.min))
+    fim = inicio + timedelta(days=days_ahead)
+
+    recs = list(
+        BetRecommendation.objects.filter(
+            is_value_bet=True, match__date__gte=inicio, match__date__lt=fim
+        )
+        .select_related("match__home_team", "match__away_team", "match__league", "bookmaker")
+        .order_by("-expected_value", "id")
+    )
+    stakes = dimensionar_carteira(
+        recs, fraction=fraction, max_per_match=max_per_match, max_total=max_total
+    )
+
+    bets = []
+    for rec, stake in zip(recs, stakes.tolist()):
+        if stake <= 0:
             continue
+        m = rec.match
+        bets.append({
+            "match_id": m.id,
+            "match": f"{m.home_team.name} x {m.away_team.name}",
+            "league": m.league.name if m.league else None,
+            "date": m.date.isoformat() if m.date else None,
+            "bet_type": rec.bet_type,
+            "odd": float(rec.odd_value),
+            "bookmaker": rec.bookmaker.name if rec.bookmaker else None,
+            "calculated_probability": float(rec.calculated_probability),
+            "expected_value": float(rec.expected_value),
+            "stake_pct": round(stake * 100, 2),
+            "stake": round(stake * bankroll, 2),
+        })
 
-        best = a.best_by_market or {}
-        probs = a.probabilities or {}
-
-        for market in ["over_25", "btts_yes", "home_win", "draw", "away_win"]:
-            best_market = best.get(market)
-            if not best_market or best_market.get("odd") is None:
-                continue
-
-            odd = float(best_market["odd"])
-            implied = implied_prob(odd)
-            calc = probs.get(market)
-            if calc is None or implied is None:
-                continue
-
-            available = []
-            field = odd_field[market]
-            for row in odds_by_match.get(m.id, []):
-                val = getattr(row, field, None)
-                if val is None:
-                    continue
-                available.append(
-                    {
-                        "name": row.bookmaker.name if row.bookmaker else None,
-                        "odd": float(val),
-                        "is_brazilian": bool(getattr(row.bookmaker, "is_brazilian", False)),
-                    }
-                )
-
-            results.append(
-                {
-                    "match_id": m.id,
-                    "match": f"{m.home_team.name} x {m.away_team.name}",
-                    "league": m.league.name if m.league else None,
-                    "date": m.date.strftime("%d/%m %H:%M"),
-                    "bet_type": market,
-                    "bet_name": bet_name.get(market, market),
-                    "odd": round(odd, 2),
-                    "calculated_probability": float(calc),
-                    "implied_probability": float(implied),
-                    "difference": round(float(calc) - float(implied), 2),
-                    "best_bookmaker": best_market.get("bookmaker"),
-                    "is_brazilian_bookmaker": bool(best_market.get("is_brazilian")),
-                    "available_bookmakers": available,
-                }
-            )
+    return Response({
+        "bankroll": bankroll,
+        "kelly_fraction": fraction,
+        "max_per_match": max_per_match,
+        "max_total": max_total,
+        "exposure_pct": round(float(stakes.sum()) * 100, 2),
+        "exposure": round(float(stakes.sum()) * bankroll, 2),
+        "bets": bets,
+    })
 
-    results.sort(key=lambda r: r.get("calculated_probability", 0), reverse=True)
-    return Response(results[:limit])
+@api_view(["GET"])
+def arbitrage(request):
+    """
+    Oportunidades de arbitragem (surebet) entre bookmakers nos próximos dias:
+    melhor preço de cada resultado (1X2, linhas de totais, BTTS) com soma de
+    1/odd abaixo de 1, e a divisão do stake entre as pernas.
+
+    Parâmetros opcionais: `days_ahead` (1-7, padrão 3), `league` (nome),
+    `min_profit` (% garantido, padrão 0) e `stake` (total a distribuir, padrão 100).
+    """
+    from datetime import datetime, time
+    from .arbitragem import escanear_arbitragem
+
+    try:
+        days_ahead = max(1, min(int(request.GET.get("days_ahead", 3)), 7))
+        min_profit = float(request.GET.get("min_profit") or 0)
+        stake = float(request.GET.get("stake") or 100)
+    except ValueError:
+        return Response({"detail": "days_ahead, min_profit e stake devem ser numéricos."}, status=400)
+    if stake <= 0:
+        return Response({"detail": "stake deve ser maior que zero."}, status=400)
+    league = (request.GET.get("league") or "").strip()
+
+    hoje = timezone.now().date()
+    inicio = timezone.make_aware(datetime.combine(hoje, time.min))
+    fim = inicio + timedelta(days=days_ahead)
+
+    return Response(escanear_arbitragem(inicio, fim, league=league, min_profit=min_profit, stake=stake))
 
 @api_view(["GET"])
 def available_bookmakers(request):
@@ -1120,6 +1278,19 @@ def available_bookmakers(request):
     })
 
 
+@api_view(["GET"])
+def debug_cache(request):
+    """
+    Endpoint de debug do cache de forma em memória (hits/misses/tempo de reconstrução)
+    """
+    from .form_cache import form_cache, versao_atual
+
+    return Response({
+        "form_version": versao_atual(),
+        "form_cache": form_cache.stats(),
+    })
+
+
 @api_view(["GET"])
 def debug_odds(request):
     """
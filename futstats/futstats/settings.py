@@ -134,6 +134,9 @@ USE_TZ = True
 STATIC_URL = 'static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 
+# Snapshot binário da forma dos times (gerado pelo precomputar_analises e lido via mmap pelos workers)
+FORM_SNAPSHOT_PATH = os.getenv("FORM_SNAPSHOT_PATH", os.path.join(BASE_DIR, 'var', 'team_form.bin'))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 